@@ -1,38 +1,112 @@
-import openai
+import asyncio
+import httpx
 from app.core.config import get_settings
+from app.core.clients import ClientRegistry, http2_available, key_fingerprint
+from app.core.cache import TwoTierCache, make_cache_key
+from app.core.governor import openai_governor
+from app.agents.audio_processing import is_wav, transcribe_chunked
 import os
+import wave
 
 settings = get_settings()
 
+TRANSCRIPTION_MODEL = "whisper-1"
+
+# Keyed by audio content hash, so retries and duplicate uploads skip Whisper
+transcription_cache = TwoTierCache(
+    "transcription",
+    max_size=settings.TRANSCRIPTION_CACHE_SIZE,
+    ttl_seconds=settings.TRANSCRIPTION_CACHE_TTL_SECONDS,
+    db_ttl_seconds=settings.TRANSCRIPTION_CACHE_DB_TTL_SECONDS
+)
+
+# One Whisper client (and its keep-alive connection pool) per API key
+_openai_clients = ClientRegistry(
+    "openai",
+    max_size=settings.CLIENT_POOL_MAX_SIZE,
+    idle_ttl_seconds=settings.CLIENT_POOL_IDLE_TTL_SECONDS,
+    close=lambda client: client.close()
+)
+
 def get_openai_client(api_key: str | None = None):
     """
-    Get OpenAI Async Client.
+    Get a pooled OpenAI Async Client.
     If api_key is provided, use it. Otherwise use the server default.
     """
     final_key = api_key if api_key else settings.OPENAI_API_KEY
     if not final_key:
          raise ValueError("No OpenAI API key provided.")
-    return openai.AsyncOpenAI(api_key=final_key)
 
-async def transcribe_audio(file_path: str, api_key: str | None = None) -> str:
+    def build():
+        # Imported on first use: the OpenAI SDK dominates cold-start import time
+        import openai
+
+        http_client = httpx.AsyncClient(
+            http2=settings.HTTP2_ENABLED and http2_available(),
+            limits=httpx.Limits(keepalive_expiry=settings.CLIENT_POOL_IDLE_TTL_SECONDS),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+        # Retries and backoff are handled by the upstream governor
+        return openai.AsyncOpenAI(api_key=final_key, http_client=http_client, max_retries=0)
+
+    return _openai_clients.get((key_fingerprint(final_key),), build)
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as audio_file:
+        return audio_file.read()
+
+async def transcribe_audio(file_path: str, api_key: str | None = None, audio_hash: str | None = None) -> str:
     """
     Transcribes audio file using OpenAI Whisper model.
     Accepts optional api_key for user-provided keys.
+    When audio_hash (SHA-256 of the file) is given, the transcription cache is used.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Audio file not found: {file_path}")
 
+    cache_key = make_cache_key(audio_hash, TRANSCRIPTION_MODEL) if audio_hash else None
+    if cache_key:
+        cached = await transcription_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
         # Get Client with specific key or default
         client = get_openai_client(api_key)
-        
-        with open(file_path, "rb") as audio_file:
-            transcription = await client.audio.transcriptions.create(
-                model="whisper-1", 
-                file=audio_file,
+
+        async def transcribe_chunk(data: bytes) -> str:
+            return await openai_governor.call(api_key, lambda: client.audio.transcriptions.create(
+                model=TRANSCRIPTION_MODEL,
+                file=("chunk.wav", data),
                 response_format="text"
-            )
-        return transcription
+            ))
+
+        data = await asyncio.to_thread(_read_file, file_path)
+        transcription = None
+        if is_wav(data):
+            # PCM audio: trim silence and transcribe long recordings in parallel chunks
+            try:
+                transcription = await transcribe_chunked(
+                    data,
+                    transcribe_chunk,
+                    max_chunk_seconds=settings.AUDIO_CHUNK_SECONDS,
+                    max_concurrency=settings.AUDIO_TRANSCRIBE_CONCURRENCY,
+                    threshold_db=settings.AUDIO_SILENCE_THRESHOLD_DB
+                )
+            except (ValueError, wave.Error, EOFError) as e:
+                # A WAV we cannot decode (float, extensible, truncated): Whisper still can
+                print(f"WAV Decode Error, sending the file whole: {e}")
+        if transcription is None:
+            # Compressed formats (e.g. browser webm) go to Whisper as-is
+            transcription = await openai_governor.call(api_key, lambda: client.audio.transcriptions.create(
+                model=TRANSCRIPTION_MODEL,
+                file=(os.path.basename(file_path), data),
+                response_format="text"
+            ))
     except Exception as e:
         print(f"Transcription Error: {e}")
         raise e
+
+    if cache_key and transcription:
+        await transcription_cache.set(cache_key, transcription)
+    return transcription
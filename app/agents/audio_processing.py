@@ -0,0 +1,154 @@
+import asyncio
+import io
+import wave
+from typing import Awaitable, Callable
+import numpy as np
+
+FRAME_MS = 30
+# Leave a little audio around speech so word onsets/endings are not clipped
+PAD_MS = 150
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+def decode_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """
+    Decode PCM WAV bytes (8, 16, 24 or 32-bit integer) into mono float32 samples in [-1, 1]
+    and the sample rate. Other encodings raise ValueError or wave.Error.
+    """
+    with wave.open(io.BytesIO(data)) as wav:
+        sample_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        # 24-bit: place each sample in the top bytes of an int32, which keeps the sign
+        triples = np.frombuffer(raw, dtype=np.uint8)[: len(raw) - len(raw) % 3].reshape(-1, 3)
+        padded = np.zeros((len(triples), 4), dtype=np.uint8)
+        padded[:, 1:] = triples
+        samples = padded.view("<i4").ravel().astype(np.float32) / 2147483648.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono float samples as 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def voiced_frames(samples: np.ndarray, sample_rate: int, threshold_db: float = -40.0, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    Energy-based voice activity detection.
+    Returns one boolean per frame: True when the frame's RMS level is above
+    threshold_db (dBFS) and within 35 dB of the loudest frame.
+    """
+    frame_len = max(1, sample_rate * frame_ms // 1000)
+    n_frames = -(-len(samples) // frame_len)
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+
+    padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+    padded[: len(samples)] = samples
+    rms = np.sqrt(np.mean(padded.reshape(n_frames, frame_len) ** 2, axis=1))
+    level_db = 20.0 * np.log10(rms + 1e-10)
+    return level_db > max(threshold_db, level_db.max() - 35.0)
+
+def trim_silence(samples: np.ndarray, sample_rate: int, threshold_db: float = -40.0) -> np.ndarray:
+    """Drop leading and trailing silence. Returns an empty array if nothing is voiced."""
+    voiced = voiced_frames(samples, sample_rate, threshold_db)
+    indices = np.flatnonzero(voiced)
+    if len(indices) == 0:
+        return samples[:0]
+
+    frame_len = max(1, sample_rate * FRAME_MS // 1000)
+    pad = sample_rate * PAD_MS // 1000
+    start = max(0, indices[0] * frame_len - pad)
+    end = min(len(samples), (indices[-1] + 1) * frame_len + pad)
+    return samples[start:end]
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    max_chunk_seconds: float,
+    threshold_db: float = -40.0,
+    min_silence_ms: int = 300
+) -> list[np.ndarray]:
+    """
+    Split audio into chunks of at most max_chunk_seconds, cutting in the middle of
+    silent gaps of at least min_silence_ms. Falls back to a hard cut when a stretch
+    of speech has no such gap.
+    """
+    max_len = int(max_chunk_seconds * sample_rate)
+    if len(samples) <= max_len:
+        return [samples]
+
+    frame_len = max(1, sample_rate * FRAME_MS // 1000)
+    silent = ~voiced_frames(samples, sample_rate, threshold_db)
+
+    # Find runs of silent frames: starts where silence begins, ends where it stops
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts) * FRAME_MS >= min_silence_ms
+    cut_points = ((run_starts[long_runs] + run_ends[long_runs]) // 2) * frame_len
+
+    chunks = []
+    start = 0
+    while len(samples) - start > max_len:
+        limit = start + max_len
+        candidates = cut_points[(cut_points > start) & (cut_points <= limit)]
+        cut = int(candidates[-1]) if len(candidates) else limit
+        chunks.append(samples[start:cut])
+        start = cut
+    chunks.append(samples[start:])
+    return chunks
+
+async def transcribe_chunked(
+    data: bytes,
+    transcribe_chunk: Callable[[bytes], Awaitable[str]],
+    max_chunk_seconds: float,
+    max_concurrency: int,
+    threshold_db: float = -40.0
+) -> str:
+    """
+    Trim silence, split at silence boundaries and transcribe the chunks concurrently
+    (at most max_concurrency at a time). Results are stitched back together in order.
+    transcribe_chunk receives WAV bytes; pass a stand-in to test without Whisper.
+    """
+    def prepare() -> tuple[list[bytes], int]:
+        samples, sample_rate = decode_wav(data)
+        samples = trim_silence(samples, sample_rate, threshold_db)
+        if len(samples) == 0:
+            return [], sample_rate
+        chunks = split_on_silence(samples, sample_rate, max_chunk_seconds, threshold_db)
+        return [encode_wav(chunk, sample_rate) for chunk in chunks], sample_rate
+
+    # Decoding and VAD are CPU-bound; keep them off the event loop
+    chunks, _ = await asyncio.to_thread(prepare)
+    if not chunks:
+        return ""
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(chunk: bytes) -> str:
+        async with semaphore:
+            return await transcribe_chunk(chunk)
+
+    texts = await asyncio.gather(*[run(chunk) for chunk in chunks])
+    return " ".join(text.strip() for text in texts if text and text.strip())
@@ -0,0 +1,155 @@
+import json
+import os
+import re
+import unicodedata
+from collections import deque
+from app.core.config import get_settings
+
+settings = get_settings()
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "phrasebook.json")
+
+# Trailing punctuation that does not change which stock phrase was meant ("Sit down." vs "sit down").
+# "?" and "!" are kept: "Yes?" asks, "Yes" answers.
+_TRAILING_PUNCTUATION = "., "
+# Spanish opening marks, whose meaning the closing mark carries
+_OPENING_MARKS = (("¿", "?"), ("¡", "!"))
+# French typography puts a space before "?" and "!"
+_SPACE_BEFORE_MARK = re.compile(r"\s+(?=[?!])")
+_WHITESPACE = re.compile(r"\s+")
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "ʼ": "'"})
+
+def phrase_key(text: str) -> str:
+    """
+    Lookup form of a phrase: NFC, case-folded, uniform apostrophes and spacing, no trailing
+    periods or commas. Questions and exclamations keep their closing mark ("¿Sí?" -> "sí?").
+    """
+    text = unicodedata.normalize("NFC", text).translate(_APOSTROPHES).casefold()
+    text = _WHITESPACE.sub(" ", text).strip().rstrip(_TRAILING_PUNCTUATION)
+    for opening, closing in _OPENING_MARKS:
+        if text.startswith(opening):
+            text = text[1:].lstrip()
+            if not text.endswith(closing):
+                text += closing
+    return _SPACE_BEFORE_MARK.sub("", text)
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over glossary terms: finds every term in a text in a single
+    pass, however many terms there are. Matching is case-insensitive and whole-word.
+    """
+    def __init__(self, terms: dict[str, str]):
+        self.terms = terms
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+        for term in terms:
+            self._add(term)
+        self._link()
+
+    def _add(self, term: str):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(term)
+
+    def _link(self):
+        # Breadth-first, so every failure link points at an already linked, shallower state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> list[str]:
+        """Glossary terms in text, longest first where matches overlap, in order of appearance."""
+        text = unicodedata.normalize("NFC", text).translate(_APOSTROPHES).casefold()
+        matches = []
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for term in self._output[state]:
+                start = end - len(term)
+                if _is_word_boundary(text, start - 1) and _is_word_boundary(text, end):
+                    matches.append((start, end, term))
+
+        # Keep the longest of overlapping matches ("high blood pressure" over "blood pressure")
+        matches.sort(key=lambda match: (match[0], -(match[1] - match[0])))
+        found, covered_until = [], 0
+        for start, end, term in matches:
+            if start >= covered_until:
+                found.append(term)
+                covered_until = end
+        return found
+
+def _is_word_boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+class Phrasebook:
+    """
+    Curated per-language-pair stock phrases and glossary terms.
+    Stock phrases are answered without an LLM call; glossary terms are passed to the
+    LLM so it uses the approved translation.
+    """
+    def __init__(self, data: dict):
+        # "en-es" -> {phrase key: translation}
+        self.phrases: dict[str, dict[str, str]] = {}
+        # "en-es" -> matcher over case-folded glossary terms
+        self.glossaries: dict[str, TermMatcher] = {}
+        for pair, entry in data.items():
+            pair = pair.lower()
+            self.phrases[pair] = {phrase_key(source): target for source, target in entry.get("phrases", {}).items()}
+            glossary = {phrase_key(term): target for term, target in entry.get("glossary", {}).items()}
+            if glossary:
+                self.glossaries[pair] = TermMatcher(glossary)
+
+    @classmethod
+    def load(cls, path: str) -> "Phrasebook":
+        try:
+            with open(path, encoding="utf-8") as data_file:
+                return cls(json.load(data_file))
+        except (OSError, ValueError) as e:
+            print(f"Phrasebook Error: {e}")
+            return cls({})
+
+    def _pairs(self, source_lang: str | None, target_lang: str) -> list[str]:
+        target_lang = target_lang.lower()
+        if source_lang:
+            return [f"{source_lang.lower()}-{target_lang}"]
+        # Unknown source: any pair into the target language
+        return [pair for pair in self.phrases if pair.endswith(f"-{target_lang}")]
+
+    def lookup(self, text: str, target_lang: str, source_lang: str | None = None) -> str | None:
+        """The curated translation of a stock phrase, or None."""
+        key = phrase_key(text)
+        for pair in self._pairs(source_lang, target_lang):
+            translation = self.phrases.get(pair, {}).get(key)
+            if translation is not None:
+                return translation
+        return None
+
+    def glossary_terms(self, text: str, target_lang: str, source_lang: str | None = None) -> dict[str, str]:
+        """Approved translations of the glossary terms that appear in text."""
+        terms = {}
+        for pair in self._pairs(source_lang, target_lang):
+            matcher = self.glossaries.get(pair)
+            if matcher is not None:
+                for term in matcher.find(text):
+                    terms[term] = matcher.terms[term]
+        return terms
+
+phrasebook = Phrasebook.load(settings.PHRASEBOOK_PATH or DEFAULT_PATH) if settings.PHRASEBOOK_ENABLED else Phrasebook({})
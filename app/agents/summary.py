@@ -1,24 +1,88 @@
+import asyncio
+from functools import lru_cache
 from fastapi import HTTPException
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from app.core.llm import get_llm
+from app.core.llm import get_chain
+from app.core.governor import gemini_governor, is_quota_error, UpstreamUnavailable
+from app.core.config import get_settings
 
-summary_prompt = ChatPromptTemplate.from_template(
-    """
-    You are a medical assistant. Summarize the following doctor-patient conversation.
-    
-    Conversation History:
-    {conversation_text}
-    
+settings = get_settings()
+
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+SUMMARY_SECTIONS = """
     Please structure your summary with the following sections if applicable:
     - **Symptoms**: What is the patient complaining about?
     - **Diagnoses**: What did the doctor suspect or confirm?
     - **Medications**: Any prescriptions mentioned?
     - **Next Steps**: Follow-up instructions.
-    
+
     Keep it concise and professional.
-    """
-)
+"""
+
+SUMMARY_TEMPLATE = """
+    You are a medical assistant. Summarize the following doctor-patient conversation.
+
+    Conversation History:
+    {conversation_text}
+    """ + SUMMARY_SECTIONS
+
+# Folds new messages into an existing summary instead of re-reading the whole visit
+UPDATE_TEMPLATE = """
+    You are a medical assistant. Below is the current summary of a doctor-patient conversation,
+    followed by messages that were exchanged after it was written.
+    Update the summary so it also covers the new messages. Keep earlier facts unless the new messages correct them.
+
+    Current Summary:
+    {summary}
+
+    New Messages:
+    {conversation_text}
+    """ + SUMMARY_SECTIONS
+
+# Reduce step for long histories: merges per-chunk summaries into one
+MERGE_TEMPLATE = """
+    You are a medical assistant. The following are partial summaries of consecutive parts of one
+    doctor-patient conversation, in chronological order. Merge them into a single summary.
+
+    Partial Summaries:
+    {summaries}
+    """ + SUMMARY_SECTIONS
+
+@lru_cache
+def prompt_for(template: str):
+    """The ChatPromptTemplate for template, built on first use so LangChain is not imported at startup."""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_template(template)
+
+def format_conversation(messages: list) -> str:
+    return "\n".join([
+        f"{msg.role.upper()}: {msg.original_text}" for msg in messages
+    ])
+
+def _chunk_messages(messages: list, max_chars: int) -> list[list]:
+    """Split messages into consecutive chunks whose formatted text stays under max_chars."""
+    chunks, current, size = [], [], 0
+    for msg in messages:
+        length = len(msg.role) + len(msg.original_text or "") + 3
+        if current and size + length > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(msg)
+        size += length
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _raise_for_quota(e: Exception):
+    if isinstance(e, UpstreamUnavailable):
+        raise HTTPException(status_code=503, detail="Summary service is temporarily unavailable.", headers={"Retry-After": str(int(e.retry_after))})
+    if is_quota_error(e):
+         raise HTTPException(status_code=429, detail="Gemini API Quota Exceeded. Please provide a new API Key in Settings.")
+
+async def _invoke(prompt, inputs: dict, api_key: str | None) -> str:
+    # Reuse the pooled chain for this key and model
+    chain = get_chain(prompt, api_key=api_key, model=SUMMARY_MODEL, temperature=0.3)
+    return await gemini_governor.call(api_key, lambda: chain.ainvoke(inputs))
 
 async def generate_summary(messages: list, api_key: str | None = None) -> str:
     """
@@ -28,25 +92,45 @@ async def generate_summary(messages: list, api_key: str | None = None) -> str:
     if not messages:
         return "No conversation history to summarize."
 
-    # Format messages into a string
-    conversation_text = "\n".join([
-        f"{msg.role.upper()}: {msg.original_text}" for msg in messages
-    ])
-
     try:
-        # Get LLM with specific key or default
-        llm = get_llm(api_key=api_key, model="gemini-2.5-flash", temperature=0.3)
-        
-        # Create chain dynamically
-        chain = summary_prompt | llm | StrOutputParser()
-        
-        response = await chain.ainvoke({
-            "conversation_text": conversation_text
-        })
-        return response
+        return await update_summary(None, messages, api_key=api_key)
+    except HTTPException:
+        raise
     except Exception as e:
-        error_msg = str(e).lower()
-        if "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg:
-             raise HTTPException(status_code=429, detail="Gemini API Quota Exceeded. Please provide a new API Key in Settings.")
         print(f"Summary Error: {e}")
         return "Failed to generate summary."
+
+async def update_summary(previous_summary: str | None, new_messages: list, api_key: str | None = None) -> str:
+    """
+    Folds new_messages into previous_summary (or summarizes them from scratch).
+    Histories longer than SUMMARY_CHUNK_CHARS are map-reduced: each chunk is summarized
+    concurrently and the partial summaries are merged.
+    Raises on failure so callers never persist an error message as a summary.
+    """
+    if not new_messages:
+        return previous_summary or "No conversation history to summarize."
+
+    try:
+        conversation_text = format_conversation(new_messages)
+        if len(conversation_text) <= settings.SUMMARY_CHUNK_CHARS:
+            if previous_summary:
+                return await _invoke(prompt_for(UPDATE_TEMPLATE), {
+                    "summary": previous_summary,
+                    "conversation_text": conversation_text
+                }, api_key)
+            return await _invoke(prompt_for(SUMMARY_TEMPLATE), {"conversation_text": conversation_text}, api_key)
+
+        # Map: summarize each chunk independently
+        chunks = _chunk_messages(new_messages, settings.SUMMARY_CHUNK_CHARS)
+        partials = await asyncio.gather(*[
+            _invoke(prompt_for(SUMMARY_TEMPLATE), {"conversation_text": format_conversation(chunk)}, api_key)
+            for chunk in chunks
+        ])
+
+        # Reduce: merge with the previous summary, which covers the earliest part
+        if previous_summary:
+            partials = [previous_summary, *partials]
+        return await _invoke(prompt_for(MERGE_TEMPLATE), {"summaries": "\n\n---\n\n".join(partials)}, api_key)
+    except Exception as e:
+        _raise_for_quota(e)
+        raise
@@ -1,37 +1,267 @@
+import asyncio
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from typing import AsyncIterator
 from fastapi import HTTPException
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from app.core.llm import get_llm
+from app.core.llm import get_chain, hedged, route_model
+from app.core.config import get_settings
+from app.core.cache import TwoTierCache, make_cache_key
+from app.core.batching import MicroBatcher
+from app.core.governor import gemini_governor, is_quota_error, UpstreamUnavailable
+from app.core.metrics import Counter, lang_pair
+from app.agents.phrasebook import phrasebook
 
-# Translation Prompt
-translation_prompt = ChatPromptTemplate.from_messages([
-    ("system", "You are a professional medical translator. Translate the user input accurately into {target_lang}. Preserve medical terminology. Do not add any conversational filler, just return the translated text."),
-    ("user", "{text}")
-])
+settings = get_settings()
 
-async def translate_text(text: str, target_lang: str, api_key: str | None = None) -> str:
+# The model tier is chosen per request by route_model (TRANSLATION_ROUTES)
+# Bump whenever translation_prompt changes so stale cached translations are not reused
+TRANSLATION_PROMPT_VERSION = "v2"
+
+# Prompts are built on first use so LangChain is not imported at startup
+
+@lru_cache
+def translation_prompt():
+    """Translation Prompt; {glossary} carries the approved translations of terms found in the input."""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", "You are a professional medical translator. Translate the user input accurately into {target_lang}. Preserve medical terminology.{glossary} Do not add any conversational filler, just return the translated text."),
+        ("user", "{text}")
+    ])
+
+@lru_cache
+def batch_translation_prompt():
+    """Several segments for the same target language in one call; answers come back as a JSON array."""
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", "You are a professional medical translator. The user input is a JSON array of independent text segments. Translate each segment accurately into {target_lang}. Preserve medical terminology.{glossary} Return only a JSON array of strings with exactly one translation per segment, in the same order, and nothing else."),
+        ("user", "{segments}")
+    ])
+
+# Shared by all requests in this process; the DB tier is shared across workers
+translation_cache = TwoTierCache(
+    "translation",
+    max_size=settings.TRANSLATION_CACHE_SIZE,
+    ttl_seconds=settings.TRANSLATION_CACHE_TTL_SECONDS,
+    db_ttl_seconds=settings.TRANSLATION_CACHE_DB_TTL_SECONDS
+)
+
+PHRASEBOOK_HITS = Counter("nao_phrasebook_hits_total", "Translations answered from the phrasebook without an LLM call.", ("lang_pair",))
+GLOSSARY_MISSES = Counter("nao_glossary_misses_total", "LLM translations that did not use an approved glossary term.", ("lang_pair",))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for cache lookups: Unicode NFC and collapsed whitespace.
+    Case is preserved since it can change the meaning of a translation.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def translation_model(text: str, target_lang: str, source_lang: str | None = None) -> str:
+    """The model tier a translation of text into target_lang is routed to ("phrasebook" if none is needed)."""
+    if phrasebook.lookup(text, target_lang, source_lang) is not None:
+        return "phrasebook"
+    return route_model(normalize_text(text), target_lang)
+
+def _cache_key(normalized: str, source_lang: str | None, target_lang: str, model: str) -> str:
+    return make_cache_key(normalized, (source_lang or "auto").lower(), target_lang.lower(), model, TRANSLATION_PROMPT_VERSION)
+
+def _phrasebook_hit(text: str, source_lang: str | None, target_lang: str) -> str | None:
+    translation = phrasebook.lookup(text, target_lang, source_lang)
+    if translation is not None:
+        PHRASEBOOK_HITS.inc(lang_pair=lang_pair(source_lang, target_lang))
+    return translation
+
+def _glossary_instruction(terms: dict[str, str]) -> str:
+    """Prompt text pinning the translation of glossary terms, or "" when there are none."""
+    if not terms:
+        return ""
+    pinned = "; ".join(f'"{term}" -> "{translation}"' for term, translation in terms.items())
+    return f" Translate these terms exactly as given: {pinned}."
+
+def _check_glossary(translation: str, terms: dict[str, str], source_lang: str | None, target_lang: str):
+    """Counts translations that ignored an approved term, so glossary drift shows up in /metrics."""
+    output = translation.casefold()
+    if any(approved.casefold() not in output for approved in terms.values()):
+        GLOSSARY_MISSES.inc(lang_pair=lang_pair(source_lang, target_lang))
+
+def _raise_for_upstream(e: Exception):
+    """Quota and outage errors become HTTP errors; anything else is left to the caller."""
+    if isinstance(e, UpstreamUnavailable):
+        raise HTTPException(status_code=503, detail="Translation service is temporarily unavailable.", headers={"Retry-After": str(int(e.retry_after))})
+    if is_quota_error(e):
+         raise HTTPException(status_code=429, detail="Gemini API Quota Exceeded. Please provide a new API Key in Settings.")
+
+def _parse_segments(response: str, expected: int) -> list[str] | None:
+    """The JSON array from a batched response, or None if it does not have one string per segment."""
+    text = response.strip()
+    if text.startswith("```"):
+        # Models sometimes wrap JSON in a Markdown code fence
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        segments = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(segments, list) or len(segments) != expected:
+        return None
+    if not all(isinstance(segment, str) for segment in segments):
+        return None
+    return segments
+
+async def _translate_one(text: str, source_lang: str | None, target_lang: str, api_key: str | None, model: str) -> str:
+    terms = phrasebook.glossary_terms(text, target_lang, source_lang)
+    chain = get_chain(translation_prompt(), api_key=api_key, model=model)
+    # A call slower than this model's p95 gets a hedged backup request
+    response = await hedged(model, lambda: gemini_governor.call(api_key, lambda: chain.ainvoke({
+        "text": text,
+        "target_lang": target_lang,
+        "glossary": _glossary_instruction(terms)
+    })))
+    if terms:
+        _check_glossary(response, terms, source_lang, target_lang)
+    return response
+
+async def _translate_group(group: tuple[str | None, str, str | None, str, str | None], segments: list[str]) -> list:
+    """
+    Batch handler: translates every segment queued for one (language pair, API key, model, session)
+    with a single multi-segment call. If the model does not return a usable array the
+    segments are translated one by one, so a bad batch never fails its callers.
+    """
+    source_lang, target_lang, api_key, model, _scope = group
+    # Coalesced by normalized text; the model gets the caller's original text, line breaks included
+    originals: dict[str, str] = {}
+    for segment in segments:
+        originals.setdefault(normalize_text(segment), segment)
+    unique = list(originals.values())
+
+    if len(unique) == 1:
+        translations = [await _translate_one(unique[0], source_lang, target_lang, api_key, model)]
+    else:
+        terms = phrasebook.glossary_terms("\n".join(unique), target_lang, source_lang)
+        chain = get_chain(batch_translation_prompt(), api_key=api_key, model=model)
+        # Batches are tracked apart from single calls; they are naturally slower
+        response = await hedged(f"{model}:batch", lambda: gemini_governor.call(api_key, lambda: chain.ainvoke({
+            "segments": json.dumps(unique, ensure_ascii=False),
+            "target_lang": target_lang,
+            "glossary": _glossary_instruction(terms)
+        })))
+        translations = _parse_segments(response, len(unique))
+        if translations is None:
+            print(f"Translation Batch Error: unusable response for {len(unique)} segments, retrying individually")
+            translations = await asyncio.gather(
+                *(_translate_one(segment, source_lang, target_lang, api_key, model) for segment in unique),
+                return_exceptions=True
+            )
+        else:
+            for segment, translation in zip(unique, translations):
+                segment_terms = phrasebook.glossary_terms(segment, target_lang, source_lang)
+                if segment_terms:
+                    _check_glossary(translation, segment_terms, source_lang, target_lang)
+
+    by_key = dict(zip(originals, translations))
+    return [by_key[normalize_text(segment)] for segment in segments]
+
+# Concurrent translate_text calls are coalesced per (language pair, API key, model, session):
+# segments of different patients never share a prompt unless TRANSLATION_BATCH_ACROSS_SESSIONS is set
+translation_batcher = MicroBatcher(
+    "translation",
+    _translate_group,
+    window_seconds=settings.TRANSLATION_BATCH_WINDOW_MS / 1000,
+    max_size=settings.TRANSLATION_BATCH_MAX_SIZE
+)
+
+async def translate_text(
+    text: str,
+    target_lang: str,
+    api_key: str | None = None,
+    source_lang: str | None = None,
+    session_id: str | None = None
+) -> str:
     """
     Translates text to target language using Gemini 2.0.
     Accepts optional api_key for user-provided keys.
+    Stock phrases are answered from the phrasebook and repeated phrases from the
+    translation cache, both without an LLM call.
+    Misses are micro-batched with concurrent requests of the same session for the same
+    target language, on the model tier route_model picks for the input.
     """
     if not text:
         return ""
-    
+
+    normalized = normalize_text(text)
+    if not normalized:
+        return text
+
+    curated = _phrasebook_hit(normalized, source_lang, target_lang)
+    if curated is not None:
+        return curated
+
+    model = route_model(normalized, target_lang)
+    cache_key = _cache_key(normalized, source_lang, target_lang, model)
+    cached = await translation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # Get LLM with specific key or default
-        llm = get_llm(api_key=api_key, model="gemini-2.5-flash")
-        
-        # Create chain dynamically
-        chain = translation_prompt | llm | StrOutputParser()
-        
-        response = await chain.ainvoke({
-            "text": text,
-            "target_lang": target_lang
-        })
-        return response
+        scope = None if settings.TRANSLATION_BATCH_ACROSS_SESSIONS else session_id
+        response = await translation_batcher.submit((source_lang, target_lang, api_key, model, scope), text)
     except Exception as e:
-        error_msg = str(e).lower()
-        if "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg:
-             raise HTTPException(status_code=429, detail="Gemini API Quota Exceeded. Please provide a new API Key in Settings.")
+        _raise_for_upstream(e)
         print(f"Translation Error: {e}")
         return text # Fallback to original text on error
+
+    # Only successful translations are cached; fallbacks must be retried next time
+    if response:
+        await translation_cache.set(cache_key, response)
+    return response
+
+async def stream_translation(text: str, target_lang: str, api_key: str | None = None, source_lang: str | None = None) -> AsyncIterator[str]:
+    """
+    Streams the translation as deltas while the model produces them.
+    Phrasebook and cache hits are yielded as a single delta. Errors propagate to the caller,
+    which decides on a fallback since partial output may already have been sent.
+    """
+    if not text:
+        return
+
+    normalized = normalize_text(text)
+    if not normalized:
+        yield text
+        return
+
+    curated = _phrasebook_hit(normalized, source_lang, target_lang)
+    if curated is not None:
+        yield curated
+        return
+
+    model = route_model(normalized, target_lang)
+    cache_key = _cache_key(normalized, source_lang, target_lang, model)
+    cached = await translation_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    terms = phrasebook.glossary_terms(text, target_lang, source_lang)
+    parts = []
+    try:
+        chain = get_chain(translation_prompt(), api_key=api_key, model=model)
+        async for delta in gemini_governor.stream(api_key, lambda: chain.astream({
+            "text": text,
+            "target_lang": target_lang,
+            "glossary": _glossary_instruction(terms)
+        })):
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception as e:
+        _raise_for_upstream(e)
+        raise
+
+    response = "".join(parts)
+    if terms and response:
+        _check_glossary(response, terms, source_lang, target_lang)
+    if response:
+        await translation_cache.set(cache_key, response)
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, or_, select, update
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.jobs import JobQueue, JobQueueFull
+from app.core.websocket import manager
+from app.models import AudioJob, ChatSession, Message
+from app.schemas import message_payload
+from app.agents.audio import transcribe_audio, TRANSCRIPTION_MODEL
+from app.agents.translation import translate_text, translation_model
+from app.core.metrics import stage, lang_pair
+
+settings = get_settings()
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Identifies this process in audio_jobs.claimed_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.AUDIO_JOB_LEASE_SECONDS)
+
+def _claimable(now: datetime):
+    """Unfinished, and nobody holds a live lease on it (this worker included: a job runs once)."""
+    return (
+        AudioJob.status.not_in(TERMINAL_STATUSES),
+        or_(AudioJob.lease_expires_at.is_(None), AudioJob.lease_expires_at < now)
+    )
+
+async def _claim(job_id: str) -> bool:
+    """
+    Take the job's lease with a single conditional UPDATE. False when the job is finished
+    or another worker is running it, so a job enqueued twice only runs once.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(AudioJob)
+            .where(AudioJob.id == job_id, *_claimable(datetime.utcnow()))
+            .values(
+                claimed_by=WORKER_ID,
+                lease_expires_at=_lease_expiry(),
+                status=case((AudioJob.status == "queued", "running"), else_=AudioJob.status)
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+async def _hold_lease(job_id: str):
+    """Renew the lease while the job runs; a crashed worker's jobs expire and can be recovered."""
+    while True:
+        await asyncio.sleep(settings.AUDIO_JOB_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(AudioJob)
+                    .where(AudioJob.id == job_id, AudioJob.claimed_by == WORKER_ID)
+                    .values(lease_expires_at=_lease_expiry())
+                )
+                await db.commit()
+        except Exception as e:
+            print(f"Audio Job Lease Error ({job_id}): {e}")
+
+async def _release(job_id: str):
+    """Give up the lease of an unfinished job (shutdown), so the next start can recover it at once."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(AudioJob)
+                .where(AudioJob.id == job_id, AudioJob.claimed_by == WORKER_ID)
+                .values(lease_expires_at=None)
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"Audio Job Lease Error ({job_id}): {e}")
+
+async def _progress(job: AudioJob, **extra):
+    await manager.broadcast(job.session_id, {
+        "type": "job_progress",
+        "job_id": job.id,
+        "session_id": job.session_id,
+        "status": job.status,
+        **extra
+    }, replay=False)
+
+async def process_audio_job(job_id: str, gemini_api_key: str | None = None, openai_api_key: str | None = None):
+    """
+    Runs transcription, translation and message creation for one job.
+    Each finished stage is persisted, so a job recovered after a restart resumes where it stopped.
+    The job only runs in the worker holding its lease.
+    """
+    if not await _claim(job_id):
+        return
+
+    lease = asyncio.create_task(_hold_lease(job_id))
+    try:
+        await _run_audio_job(job_id, gemini_api_key, openai_api_key)
+    finally:
+        lease.cancel()
+        await _release(job_id)
+
+async def _run_audio_job(job_id: str, gemini_api_key: str | None, openai_api_key: str | None):
+    async with AsyncSessionLocal() as db:
+        job = await db.get(AudioJob, job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return
+
+        try:
+            session = await db.get(ChatSession, job.session_id)
+            if session is None:
+                raise ValueError("Session not found")
+            if job.role == 'doctor':
+                source_lang, target_lang = session.doctor_lang, session.patient_lang
+            else:
+                source_lang, target_lang = session.patient_lang, session.doctor_lang
+
+            # 1. Transcribe (cached by audio hash)
+            if job.transcription is None:
+                with stage("transcribe", model=TRANSCRIPTION_MODEL, lang_pair=lang_pair(source_lang, None)):
+                    job.transcription = await transcribe_audio(job.audio_path, api_key=openai_api_key, audio_hash=job.audio_hash)
+                job.status = "transcribed"
+                await db.commit()
+                await _progress(job, transcription=job.transcription)
+
+            # 2. Translate Transcription
+            if job.translation is None:
+                try:
+                    with stage("translate", model=translation_model(job.transcription, target_lang, source_lang), lang_pair=lang_pair(source_lang, target_lang)):
+                        job.translation = await translate_text(job.transcription, target_lang, api_key=gemini_api_key, source_lang=source_lang, session_id=job.session_id)
+                except Exception as e:
+                    # Fallback: Use transcription and append warning
+                    print(f"Translation failed: {e}")
+                    job.translation = f"{job.transcription}\n\n[⚠️ System: Translation failed (API Quota Exceeded). Please check Settings.]"
+                job.status = "translated"
+                await db.commit()
+                await _progress(job, translation=job.translation)
+
+            # 3. Save message and complete the job in one transaction
+            new_message = Message(
+                session_id=job.session_id,
+                role=job.role,
+                original_text=job.transcription,
+                translated_text=job.translation,
+                audio_url=job.audio_url
+            )
+            db.add(new_message)
+            await db.flush()
+            # Only while still holding the lease, so a job taken over by another worker
+            # does not produce a second message
+            completed = await db.execute(
+                update(AudioJob)
+                .where(AudioJob.id == job_id, AudioJob.claimed_by == WORKER_ID)
+                .values(status="completed", message_id=new_message.id, lease_expires_at=None)
+            )
+            if completed.rowcount != 1:
+                print(f"Audio Job Lost ({job_id}): another worker took it over")
+                await db.rollback()
+                return
+            # id and timestamp were set by the flush; no refresh needed
+            with stage("db_commit"):
+                await db.commit()
+        except Exception as e:
+            print(f"Audio Job Failed ({job_id}): {e}")
+            await db.rollback()
+            failed = await db.execute(
+                update(AudioJob)
+                .where(AudioJob.id == job_id, AudioJob.claimed_by == WORKER_ID)
+                .values(status="failed", error=str(getattr(e, "detail", e)), lease_expires_at=None)
+            )
+            await db.commit()
+            if failed.rowcount == 1:
+                job = await db.get(AudioJob, job_id, populate_existing=True)
+                await _progress(job, error=job.error)
+            return
+
+        # 4. Broadcast to WebSocket clients
+        await manager.broadcast(job.session_id, {
+            "type": "new_message",
+            "job_id": job.id,
+            "message": message_payload(new_message)
+        })
+
+audio_job_queue = JobQueue(
+    "audio",
+    process_audio_job,
+    concurrency=settings.AUDIO_JOB_CONCURRENCY,
+    max_pending=settings.AUDIO_JOB_MAX_PENDING
+)
+
+async def recover_audio_jobs(startup: bool = False) -> int:
+    """
+    Enqueue unfinished jobs nobody is running: those whose lease expired (their worker
+    died mid-run) and, at startup, those left queued by a previous process. Later sweeps
+    only take unclaimed jobs older than a lease period, which a live worker would have
+    started by then. A job enqueued by two workers still runs once: see _claim.
+    Stops when the queue is full; the next sweep picks up the rest.
+    User-supplied API keys are never persisted, so recovered jobs use the server keys.
+    """
+    now = datetime.utcnow()
+    stale = or_(AudioJob.lease_expires_at < now, AudioJob.lease_expires_at.is_(None))
+    if not startup:
+        stale = or_(
+            AudioJob.lease_expires_at < now,
+            and_(AudioJob.lease_expires_at.is_(None), AudioJob.updated_at < now - timedelta(seconds=settings.AUDIO_JOB_LEASE_SECONDS))
+        )
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AudioJob.id)
+            .where(AudioJob.status.not_in(TERMINAL_STATUSES), stale)
+            .order_by(AudioJob.created_at)
+        )
+        job_ids = result.scalars().all()
+
+    recovered = 0
+    for job_id in job_ids:
+        try:
+            audio_job_queue.submit(job_id)
+        except JobQueueFull:
+            break
+        recovered += 1
+    if recovered:
+        print(f"Recovered {recovered} audio job(s)")
+    return recovered
+
+async def sweep_audio_jobs():
+    """Background task: recover jobs at startup, then every AUDIO_JOB_SWEEP_SECONDS."""
+    startup = True
+    while True:
+        try:
+            await recover_audio_jobs(startup=startup)
+            startup = False
+        except Exception as e:
+            print(f"Audio Job Recovery Error: {e}")
+        await asyncio.sleep(settings.AUDIO_JOB_SWEEP_SECONDS)
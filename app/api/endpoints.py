@@ -1,46 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from app.core.database import get_db
-from app.models import ChatSession, Message
-from app.schemas import SessionCreate, SessionResponse, MessageCreate, MessageResponse, SummaryRequest, SummaryResponse
-from app.agents.translation import translate_text
-from app.agents.summary import generate_summary
-from app.agents.audio import transcribe_audio
+from app.models import ChatSession, Message, SummaryCheckpoint, AudioJob
+from app.schemas import SessionCreate, SessionResponse, MessageCreate, MessageBatch, MessageResponse, SummaryRequest, SummaryResponse, AudioJobResponse, SearchHit, SearchResponse, message_payload
+from app.agents.translation import translate_text, stream_translation, translation_cache, translation_batcher, translation_model
+from app.agents.summary import update_summary, SUMMARY_MODEL
+from app.agents.audio import transcribe_audio, transcription_cache, TRANSCRIPTION_MODEL
+from app.core.storage import save_upload, UploadTooLarge
+from app.core.search import search_messages as run_search
+from app.core.messages import list_messages, clear_session_messages, message_writer
+from app.core.export import ConsumerWatermark, export_records, ndjson_chunks
+from app.core.static import accepted_encodings
+from app.core.session_cache import SessionSnapshot, session_cache
+from app.core.jobs import JobQueueFull
+from app.core.governor import gemini_governor, openai_governor, is_quota_error, UpstreamUnavailable
+from app.core.metrics import stage, lang_pair
+from app.api.audio_jobs import audio_job_queue
+from app.core.config import get_settings
 from app.core.websocket import manager
-import shutil
-import os
+from app.core.warmup import status as warmup_status
+import asyncio
+import json
+import secrets
 import uuid
 
+settings = get_settings()
 router = APIRouter()
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str = Query(...),
+    last_seq: int | None = Query(None, ge=0, description="Newest event seq seen; resume from there"),
+    last_message_id: int | None = Query(None, description="Newest message held, used when the replay buffer has rolled over")
+):
     try:
+        await manager.connect(websocket, session_id, last_seq=last_seq, last_message_id=last_message_id)
         while True:
             # Keep connection alive, listen for pings
             await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        manager.disconnect(websocket, session_id)
+
+def _languages(session: SessionSnapshot, role: str) -> tuple[str, str]:
+    """(source, target) language of a message sent by role."""
+    if role == 'doctor':
+        return session.doctor_lang, session.patient_lang
+    return session.patient_lang, session.doctor_lang
+
+async def _translate_message(content: str, source_lang: str, target_lang: str, api_key: str | None, session_id: str) -> str:
+    """Translate one message; on failure, the original text with a warning."""
+    try:
+        with stage("translate", model=translation_model(content, target_lang, source_lang), lang_pair=lang_pair(source_lang, target_lang)):
+            return await translate_text(content, target_lang, api_key=api_key, source_lang=source_lang, session_id=session_id)
+    except Exception as e:
+        # Fallback: Use original text and append warning
+        print(f"Translation failed: {e}")
+        return f"{content}\n\n[⚠️ System: Translation failed (API Quota Exceeded). Please check Settings.]"
+
+async def _until_disconnected(request: Request, awaitable):
+    """
+    Await `awaitable`, but cancel it, along with the upstream AI calls it is waiting on,
+    if the HTTP client disconnects first. The request body must already have been read.
+    """
+    task = asyncio.ensure_future(awaitable)
+
+    async def wait_for_disconnect():
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        abandoned = not task.done()
+        if abandoned:
+            task.cancel()
+
+    if abandoned:
+        # 499 Client Closed Request: nobody is listening, but it shows up in metrics and logs
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    return task.result()
 
 async def get_current_session(
     x_session_id: str = Header(..., alias="X-Session-ID"),
     db: AsyncSession = Depends(get_db)
-):
+) -> SessionSnapshot:
+    # Served from memory on most requests; the DB is only hit on a miss
+    snapshot = session_cache.get(x_session_id)
+    if snapshot is not None:
+        return snapshot
+
     result = await db.execute(select(ChatSession).where(ChatSession.id == x_session_id))
     session = result.scalars().first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return session
+    snapshot = session_cache.put(session)
+    # Hand the connection back: the request may go on to wait for work that needs one (group commit)
+    await db.commit()
+    return snapshot
 
 @router.post("/session", response_model=SessionResponse)
 async def create_session(session_data: SessionCreate, db: AsyncSession = Depends(get_db)):
     new_session = ChatSession(
         doctor_lang=session_data.doctor_lang,
-        patient_lang=session_data.patient_lang
+        patient_lang=session_data.patient_lang,
+        clinician_id=session_data.clinician_id
     )
     db.add(new_session)
     await db.commit()
@@ -82,19 +152,15 @@ async def get_demo_session(
             session.doctor_lang = doctor_lang
             session.patient_lang = patient_lang
             
-            # Clear chat history (delete messages)
-            stmt = select(Message).where(Message.session_id == DEMO_SESSION_ID)
-            result_msgs = await db.execute(stmt)
-            messages = result_msgs.scalars().all()
-            
-            for msg in messages:
-                await db.delete(msg)
+            # Clear chat history (single bulk delete)
+            await clear_session_messages(db, [DEMO_SESSION_ID])
             
             await db.commit()
+            await session_cache.invalidate(DEMO_SESSION_ID)
             
             # Broadcast clear event so connected clients update immediately
             from app.core.websocket import manager
-            await manager.broadcast({
+            await manager.broadcast(DEMO_SESSION_ID, {
                 "type": "clear_history",
                 "session_id": DEMO_SESSION_ID
             })
@@ -105,155 +171,409 @@ async def get_demo_session(
     return session
 
 @router.get("/session", response_model=SessionResponse)
-async def get_session_info(session: ChatSession = Depends(get_current_session)):
+async def get_session_info(session: SessionSnapshot = Depends(get_current_session)):
     return session
 
 @router.get("/messages", response_model=list[MessageResponse])
-async def get_messages(session: ChatSession = Depends(get_current_session), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Message).where(Message.session_id == session.id).order_by(Message.timestamp))
-    return result.scalars().all()
+async def get_messages(
+    after: int | None = Query(None, description="Only messages after this message ID"),
+    limit: int | None = Query(None, ge=1, le=500),
+    tail: int | None = Query(None, ge=1, le=500, description="Only the newest N messages"),
+    session: SessionSnapshot = Depends(get_current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Message history, oldest first. Page forward with ?after=<last id>&limit=N,
+    or load the newest N with ?tail=N.
+    """
+    return await list_messages(db, session.id, after_id=after, limit=limit, tail=tail)
 
 @router.post("/chat", response_model=MessageResponse)
 async def send_message(
     message_data: MessageCreate, 
-    session: ChatSession = Depends(get_current_session),
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    session: SessionSnapshot = Depends(get_current_session),
     x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key")
 ):
     # 1. Determine Target Lang
-    target_lang = session.patient_lang if message_data.role == 'doctor' else session.doctor_lang
-    
-    # 2. Translate
-    try:
-        translation = await translate_text(message_data.content, target_lang, api_key=x_gemini_api_key)
-    except Exception as e:
-        # Fallback: Use original text and append warning
-        print(f"Translation failed: {e}")
-        translation = f"{message_data.content}\n\n[⚠️ System: Translation failed (API Quota Exceeded). Please check Settings.]"
+    source_lang, target_lang = _languages(session, message_data.role)
     
-    # 3. Save
-    new_message = Message(
-        session_id=session.id,
-        role=message_data.role,
-        original_text=message_data.content,
-        translated_text=translation
+    # 2. Translate (abandoned if the client goes away)
+    translation = await _until_disconnected(
+        request, _translate_message(message_data.content, source_lang, target_lang, x_gemini_api_key, session.id)
     )
-    db.add(new_message)
-    await db.commit()
-    await db.refresh(new_message)
+    
+    # 3. Save (group-committed with concurrent requests)
+    with stage("db_commit"):
+        new_message = await message_writer.add(
+            session_id=session.id,
+            role=message_data.role,
+            original_text=message_data.content,
+            translated_text=translation
+        )
     
     # 4. Broadcast to WebSocket clients
     from app.core.websocket import manager
-    await manager.broadcast({
+    await manager.broadcast(session.id, {
         "type": "new_message",
-        "message": {
-            "id": new_message.id,
-            "session_id": new_message.session_id,
-            "role": new_message.role,
-            "original_text": new_message.original_text,
-            "translated_text": new_message.translated_text,
-            "audio_url": new_message.audio_url,
-            "timestamp": new_message.timestamp.isoformat()
-        }
+        "message": message_payload(new_message)
     })
     
     return new_message
 
+@router.post("/chat/batch", response_model=list[MessageResponse])
+async def send_messages(
+    batch: MessageBatch,
+    request: Request,
+    session: SessionSnapshot = Depends(get_current_session),
+    x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key")
+):
+    """
+    Translates and saves many messages in one request, e.g. discharge instructions.
+    Segments are translated concurrently, so the translation batcher packs them into a few
+    multi-segment LLM calls per target language. Messages are saved in one transaction.
+    """
+    if not batch.messages:
+        return []
+    if len(batch.messages) > settings.CHAT_BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.CHAT_BATCH_MAX_MESSAGES} messages per batch")
+
+    # 1. Translate every segment concurrently
+    translations = await _until_disconnected(request, asyncio.gather(*(
+        _translate_message(message_data.content, *_languages(session, message_data.role), x_gemini_api_key, session.id)
+        for message_data in batch.messages
+    )))
+
+    # 2. Save all messages in one transaction, in request order
+    with stage("db_commit"):
+        new_messages = await message_writer.add_many([
+            {
+                "session_id": session.id,
+                "role": message_data.role,
+                "original_text": message_data.content,
+                "translated_text": translation
+            }
+            for message_data, translation in zip(batch.messages, translations)
+        ])
+
+    # 3. Broadcast in order
+    for new_message in new_messages:
+        await manager.broadcast(session.id, {
+            "type": "new_message",
+            "message": message_payload(new_message)
+        })
+
+    return new_messages
+
+# /chat/stream tasks still running, possibly after their SSE client went away
+_stream_tasks: set[asyncio.Task] = set()
+
+def _stream_done(task: asyncio.Task):
+    _stream_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Stream Error: {task.exception()}")
+
+@router.post("/chat/stream", response_model=MessageResponse)
+async def stream_message(
+    message_data: MessageCreate,
+    session: SessionSnapshot = Depends(get_current_session),
+    accept: str | None = Header(None),
+    x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key")
+):
+    """
+    Like /chat, but pushes translation deltas to the session's WebSocket clients as they arrive.
+    Send `Accept: text/event-stream` to also receive the deltas as Server-Sent Events
+    (an `error` event ends the stream if it fails); otherwise the saved message is
+    returned once the stream completes.
+    """
+    source_lang, target_lang = _languages(session, message_data.role)
+    events: asyncio.Queue = asyncio.Queue()
+
+    # Runs independently of the response so the message is saved even if an SSE client goes away
+    task = asyncio.create_task(
+        _stream_and_save(message_data, session.id, source_lang, target_lang, x_gemini_api_key, events)
+    )
+    # The loop only keeps a weak reference to tasks
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_done)
+
+    if accept and "text/event-stream" in accept:
+        return StreamingResponse(_sse_events(events), media_type="text/event-stream")
+    return await task
+
+async def _stream_and_save(
+    message_data: MessageCreate,
+    session_id: str,
+    source_lang: str,
+    target_lang: str,
+    api_key: str | None,
+    events: asyncio.Queue
+) -> Message:
+    stream_id = str(uuid.uuid4())
+
+    async def emit(event: dict, replay: bool = True):
+        await events.put(event)
+        await manager.broadcast(session_id, event, replay=replay)
+
+    try:
+        await emit({
+            "type": "translation_start",
+            "stream_id": stream_id,
+            "session_id": session_id,
+            "role": message_data.role,
+            "original_text": message_data.content
+        }, replay=False)
+
+        # 1. Stream the translation
+        parts = []
+        try:
+            with stage("translate_stream", model=translation_model(message_data.content, target_lang, source_lang), lang_pair=lang_pair(source_lang, target_lang)):
+                async for delta in stream_translation(message_data.content, target_lang, api_key=api_key, source_lang=source_lang):
+                    parts.append(delta)
+                    await emit({
+                        "type": "translation_delta",
+                        "stream_id": stream_id,
+                        "session_id": session_id,
+                        "delta": delta
+                    }, replay=False)
+            translation = "".join(parts)
+        except Exception as e:
+            # Fallback: Use original text and append warning; clients replace the partial text
+            print(f"Translation failed: {e}")
+            translation = f"{message_data.content}\n\n[⚠️ System: Translation failed (API Quota Exceeded). Please check Settings.]"
+
+        # 2. Save once the stream has completed
+        with stage("db_commit"):
+            new_message = await message_writer.add(
+                session_id=session_id,
+                role=message_data.role,
+                original_text=message_data.content,
+                translated_text=translation
+            )
+
+        # 3. Final message replaces the partial one on every client
+        await emit({
+            "type": "new_message",
+            "stream_id": stream_id,
+            "message": message_payload(new_message)
+        })
+        return new_message
+    except Exception as e:
+        # SSE clients get an error event and the end of the stream instead of a stall
+        await events.put({
+            "type": "error",
+            "stream_id": stream_id,
+            "session_id": session_id,
+            "detail": f"Streaming failed: {e}"
+        })
+        raise
+    finally:
+        await events.put(None)
+
+async def _sse_events(events: asyncio.Queue):
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
 @router.post("/audio", response_model=MessageResponse)
 async def upload_audio(
+    request: Request,
     role: str = Form(...),
     file: UploadFile = File(...),
-    session: ChatSession = Depends(get_current_session),
-    db: AsyncSession = Depends(get_db),
+    session: SessionSnapshot = Depends(get_current_session),
     x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key"),
     x_openai_api_key: str | None = Header(None, alias="X-OpenAI-API-Key")
 ):
-    # 1. Save File
-    file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    source_lang, target_lang = _languages(session, role)
+
+    # 1. Save File (streamed, hashed, content-addressed)
+    try:
+        with stage("file_save"):
+            stored = await save_upload(file, max_bytes=settings.AUDIO_MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
         
-    # 2. Transcribe
+    # 2. Transcribe (cached by audio hash)
     try:
-        transcription = await transcribe_audio(file_path, api_key=x_openai_api_key)
+        with stage("transcribe", model=TRANSCRIPTION_MODEL, lang_pair=lang_pair(source_lang, None)):
+            transcription = await _until_disconnected(
+                request, transcribe_audio(stored.path, api_key=x_openai_api_key, audio_hash=stored.sha256)
+            )
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise HTTPException(status_code=503, detail="Transcription service is temporarily unavailable.", headers={"Retry-After": str(int(e.retry_after))})
     except Exception as e:
-         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
-
-    target_lang = session.patient_lang if role == 'doctor' else session.doctor_lang
+        if is_quota_error(e):
+            raise HTTPException(status_code=429, detail="OpenAI API Quota Exceeded. Please provide a new API Key in Settings.")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
     # 3. Translate Transcription
-    try:
-        translation = await translate_text(transcription, target_lang, api_key=x_gemini_api_key)
-    except Exception as e:
-        # Fallback: Use transcription and append warning
-        print(f"Translation failed: {e}")
-        translation = f"{transcription}\n\n[⚠️ System: Translation failed (API Quota Exceeded). Please check Settings.]"
-
-    # 4. Save
-    new_message = Message(
-        session_id=session.id,
-        role=role,
-        original_text=transcription,
-        translated_text=translation,
-        audio_url=f"/uploads/{os.path.basename(file_path)}" # URL path
+    translation = await _until_disconnected(
+        request, _translate_message(transcription, source_lang, target_lang, x_gemini_api_key, session.id)
     )
-    db.add(new_message)
-    await db.commit()
-    await db.refresh(new_message)
+
+    # 4. Save (group-committed with concurrent requests)
+    with stage("db_commit"):
+        new_message = await message_writer.add(
+            session_id=session.id,
+            role=role,
+            original_text=transcription,
+            translated_text=translation,
+            audio_url=stored.url # URL path
+        )
     
     # 5. Broadcast to WebSocket clients
     from app.core.websocket import manager
-    await manager.broadcast({
+    await manager.broadcast(session.id, {
         "type": "new_message",
-        "message": {
-            "id": new_message.id,
-            "session_id": new_message.session_id,
-            "role": new_message.role,
-            "original_text": new_message.original_text,
-            "translated_text": new_message.translated_text,
-            "audio_url": new_message.audio_url,
-            "timestamp": new_message.timestamp.isoformat()
-        }
+        "message": message_payload(new_message)
     })
     
     return new_message
 
+@router.post("/audio/jobs", response_model=AudioJobResponse, status_code=202)
+async def submit_audio_job(
+    role: str = Form(...),
+    file: UploadFile = File(...),
+    session: SessionSnapshot = Depends(get_current_session),
+    db: AsyncSession = Depends(get_db),
+    x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key"),
+    x_openai_api_key: str | None = Header(None, alias="X-OpenAI-API-Key")
+):
+    """
+    Saves the audio and returns immediately with a job ID.
+    Transcription and translation run in the background worker pool; progress
+    (`transcribed`, `translated`) and the final message arrive over the session WebSocket.
+    """
+    # 1. Save File (streamed, hashed, content-addressed)
+    try:
+        with stage("file_save"):
+            stored = await save_upload(file, max_bytes=settings.AUDIO_MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # 2. Persist the job so it survives restarts
+    job = AudioJob(
+        session_id=session.id,
+        role=role,
+        audio_path=stored.path,
+        audio_url=stored.url,
+        audio_hash=stored.sha256
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    # 3. Hand off to the worker pool
+    try:
+        audio_job_queue.submit(job.id, gemini_api_key=x_gemini_api_key, openai_api_key=x_openai_api_key)
+    except JobQueueFull:
+        job.status = "failed"
+        job.error = "Server busy, please retry"
+        await db.commit()
+        raise HTTPException(status_code=503, detail="Audio processing queue is full. Please retry shortly.")
+
+    return job
+
+@router.get("/audio/jobs/{job_id}", response_model=AudioJobResponse)
+async def get_audio_job(
+    job_id: str,
+    session: SessionSnapshot = Depends(get_current_session),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await db.get(AudioJob, job_id)
+    # Jobs of other sessions are reported as missing
+    if not job or job.session_id != session.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.post("/summary", response_model=SummaryResponse)
 async def get_summary(
     req: SummaryRequest, # Kept for potential future params, currently empty
-    session: ChatSession = Depends(get_current_session),
+    request: Request,
+    session: SessionSnapshot = Depends(get_current_session),
     db: AsyncSession = Depends(get_db),
     x_gemini_api_key: str | None = Header(None, alias="X-Gemini-API-Key")
 ):
-    # 1. Fetch messages
-    result = await db.execute(select(Message).where(Message.session_id == session.id).order_by(Message.timestamp))
-    messages = result.scalars().all()
-    
-    # 2. Generate Summary
-    summary_text = await generate_summary(messages, api_key=x_gemini_api_key)
+    # 1. Fetch only the messages the last checkpoint does not cover
+    checkpoint = await db.get(SummaryCheckpoint, session.id)
+    new_messages = await list_messages(
+        db, session.id, after_id=checkpoint.last_message_id if checkpoint else None
+    )
+
+    if checkpoint and not new_messages:
+        return SummaryResponse(summary=checkpoint.summary, cached=True)
+    if not new_messages:
+        return SummaryResponse(summary="No conversation history to summarize.")
+
+    # 2. Fold the new messages into the previous summary
+    try:
+        with stage("summary", model=SUMMARY_MODEL):
+            summary_text = await _until_disconnected(request, update_summary(
+                checkpoint.summary if checkpoint else None,
+                new_messages,
+                api_key=x_gemini_api_key
+            ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Summary Error: {e}")
+        return SummaryResponse(summary="Failed to generate summary.")
+
+    # 3. Save the checkpoint for the next request
+    if checkpoint is None:
+        checkpoint = SummaryCheckpoint(session_id=session.id)
+        db.add(checkpoint)
+    checkpoint.summary = summary_text
+    checkpoint.last_message_id = new_messages[-1].id
+    try:
+        with stage("db_commit"):
+            await db.commit()
+    except IntegrityError:
+        # A concurrent request saved the first checkpoint; it covers the same messages
+        await db.rollback()
+
     return SummaryResponse(summary=summary_text)
 
-@router.get("/search", response_model=list[MessageResponse])
+@router.get("/search", response_model=SearchResponse)
 async def search_messages(
     q: str,
-    session: ChatSession = Depends(get_current_session),
+    scope: str = Query("session", pattern="^(session|clinician)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    session: SessionSnapshot = Depends(get_current_session),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Search messages in the current session for keywords.
+    Full-text search in original OR translated text, best match first.
+    scope=clinician searches every session of the current session's clinician.
+    Pass the returned next_cursor as ?cursor= to fetch the next page.
     """
     if not q:
-        return []
+        return SearchResponse(results=[])
 
-    # Case-insensitive search in original OR translated text
-    search_pattern = f"%{q}%"
-    stmt = select(Message).where(
-        Message.session_id == session.id,
-        (Message.original_text.ilike(search_pattern)) | (Message.translated_text.ilike(search_pattern))
-    ).order_by(Message.timestamp)
-    
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    if scope == "clinician":
+        if not session.clinician_id:
+            raise HTTPException(status_code=400, detail="Session has no clinician_id")
+        filters = {"clinician_id": session.clinician_id}
+    else:
+        filters = {"session_id": session.id}
+
+    try:
+        rows, next_cursor = await run_search(db, q, limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return SearchResponse(
+        results=[
+            SearchHit.model_validate({**message_payload(message), "snippet": snippet, "score": score})
+            for message, score, snippet in rows
+        ],
+        next_cursor=next_cursor
+    )
 
 @router.post("/clear/{session_id}")
 async def clear_chat_history(
@@ -264,21 +584,103 @@ async def clear_chat_history(
     Clears all messages for a specific session and notifies clients.
     DOES NOT delete the session itself, only messages.
     """
-    # 1. Delete messages
-    stmt = select(Message).where(Message.session_id == session_id)
-    result = await db.execute(stmt)
-    messages = result.scalars().all()
-    
-    for msg in messages:
-        await db.delete(msg)
+    # 1. Delete messages (single bulk delete)
+    await clear_session_messages(db, [session_id])
     
     await db.commit()
     
     # 2. Broadcast clear event
     from app.core.websocket import manager
-    await manager.broadcast({
+    await manager.broadcast(session_id, {
         "type": "clear_history",
         "session_id": session_id
     })
     
     return {"status": "success", "message": "Chat history cleared"}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters for the translation and transcription caches of this worker,
+    plus how well concurrent translations and message inserts are being batched
+    and what the WebSocket replay buffer holds.
+    """
+    return {
+        "translation": translation_cache.snapshot(),
+        "transcription": transcription_cache.snapshot(),
+        "translation_batches": translation_batcher.stats(),
+        "message_writes": message_writer.stats(),
+        "websocket_replay": manager.replay.stats()
+    }
+
+@router.get("/upstream/status")
+async def get_upstream_status():
+    """
+    Circuit breaker state and retry counters of the Gemini and OpenAI governors in this worker.
+    """
+    return {
+        "gemini": gemini_governor.stats(),
+        "openai": openai_governor.stats()
+    }
+
+@router.get("/health")
+async def get_health(request: Request):
+    """
+    Readiness probe: answers once startup (migrations included) has finished.
+    Also reports the schema version and whether the optional warm-up has completed.
+    """
+    return {
+        "status": "ok",
+        "schema_version": getattr(request.app.state, "schema_version", None),
+        "warm_up": warmup_status
+    }
+
+def _naive_utc(value: datetime | None) -> datetime | None:
+    """Timestamps are stored as naive UTC; convert aware query values to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+@router.get("/export")
+async def export_sessions(
+    request: Request,
+    start: datetime | None = Query(None, description="Only messages at or after this time (UTC unless an offset is given)"),
+    end: datetime | None = Query(None, description="Only messages before this time"),
+    after_id: int | None = Query(None, ge=0, description="Only messages after this message ID"),
+    consumer: str | None = Query(None, min_length=1, max_length=64, description="Resume after this consumer's last completed export; not combinable with the filters"),
+    clinician_id: str | None = None,
+    include_summaries: bool = False,
+    x_export_token: str | None = Header(None, alias="X-Export-Token")
+):
+    """
+    Streams messages of every matching session as NDJSON (session, message, summary
+    and a final end record), gzip-compressed when the client accepts it.
+    Memory use is constant however many sessions are exported.
+    A consumer's watermark moves only after the whole response was sent.
+    """
+    if not settings.EXPORT_TOKEN:
+        raise HTTPException(status_code=403, detail="Export is disabled. Set EXPORT_TOKEN to enable it.")
+    if not x_export_token or not secrets.compare_digest(x_export_token, settings.EXPORT_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid export token")
+    # The watermark is one position per consumer: a filtered export would move it past messages it skipped
+    if consumer is not None and (start or end or after_id is not None or clinician_id is not None):
+        raise HTTPException(status_code=400, detail="consumer cannot be combined with start, end, after_id or clinician_id")
+
+    watermark = ConsumerWatermark(consumer) if consumer is not None else None
+    records = export_records(
+        start=_naive_utc(start),
+        end=_naive_utc(end),
+        after_id=after_id,
+        clinician_id=clinician_id,
+        include_summaries=include_summaries,
+        watermark=watermark
+    )
+    compress = "gzip" in accepted_encodings(request.headers.get("accept-encoding", ""))
+    filename = f"nao-export-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    body = ndjson_chunks(records, compress=compress)
+    if watermark is not None:
+        body = watermark.track(body)
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers, background=watermark)
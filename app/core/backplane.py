@@ -0,0 +1,155 @@
+import asyncio
+from typing import Awaitable, Callable
+from app.core.config import get_settings
+
+settings = get_settings()
+
+Handler = Callable[[str, str], Awaitable[None]]
+
+# Counters of idle keys (e.g. sessions nobody writes to) expire from Redis after this long
+SEQUENCE_TTL_SECONDS = 7 * 24 * 3600
+
+class Backplane:
+    """
+    Pub/sub bus that carries events between worker processes.
+    Channels are plain strings (e.g. 'session:<id>'); payloads are serialized JSON.
+    Handlers subscribe by channel prefix and receive (channel, payload).
+    """
+    def __init__(self):
+        self._handlers: list[tuple[str, Handler]] = []
+
+    def subscribe(self, prefix: str, handler: Handler):
+        self._handlers.append((prefix, handler))
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, payload: str):
+        raise NotImplementedError
+
+    async def next_sequence(self, key: str) -> int:
+        """Increment and return a counter shared by every worker (event sequence numbers)."""
+        raise NotImplementedError
+
+    async def current_sequence(self, key: str) -> int:
+        """The counter's latest value, 0 if it was never incremented."""
+        raise NotImplementedError
+
+    async def dispatch(self, channel: str, payload: str):
+        for prefix, handler in self._handlers:
+            if channel.startswith(prefix):
+                try:
+                    await handler(channel, payload)
+                except Exception as e:
+                    print(f"Backplane Handler Error ({channel}): {e}")
+
+class InMemoryBackplane(Backplane):
+    """Single-process backplane: publishing delivers straight to local handlers."""
+    def __init__(self):
+        super().__init__()
+        self._sequences: dict[str, int] = {}
+
+    async def publish(self, channel: str, payload: str):
+        await self.dispatch(channel, payload)
+
+    async def next_sequence(self, key: str) -> int:
+        self._sequences[key] = self._sequences.get(key, 0) + 1
+        return self._sequences[key]
+
+    async def current_sequence(self, key: str) -> int:
+        return self._sequences.get(key, 0)
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub backplane shared by every worker and node.
+    Pass `client` to use an existing redis.asyncio-compatible client (e.g. a local stand-in).
+    """
+    def __init__(self, url: str | None = None, client=None, prefix: str = "nao:", reconnect_delay: float = 1.0):
+        super().__init__()
+        self.url = url
+        self.client = client
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+        self._listener: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+        self._owns_client = client is None
+
+    async def start(self):
+        if self.client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError("BROADCAST_BACKEND=redis requires the 'redis' package.")
+            self.client = redis.from_url(self.url)
+        self._ready = asyncio.Event()
+        self._listener = asyncio.create_task(self._listen())
+        try:
+            # Wait for the subscription so events published right after startup are not missed
+            await asyncio.wait_for(self._ready.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            print("Backplane Warning: Redis subscription not ready yet, retrying in background")
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def publish(self, channel: str, payload: str):
+        await self.client.publish(self.prefix + channel, payload)
+
+    async def next_sequence(self, key: str) -> int:
+        name = f"{self.prefix}seq:{key}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incr(name)
+            pipe.expire(name, SEQUENCE_TTL_SECONDS)
+            sequence, _ = await pipe.execute()
+        return int(sequence)
+
+    async def current_sequence(self, key: str) -> int:
+        value = await self.client.get(f"{self.prefix}seq:{key}")
+        return int(value) if value is not None else 0
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.psubscribe(self.prefix + "*")
+                self._ready.set()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    channel = _decode(message["channel"])[len(self.prefix):]
+                    await self.dispatch(channel, _decode(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane Connection Error: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def create_backplane() -> Backplane:
+    if settings.BROADCAST_BACKEND == "redis":
+        return RedisBackplane(url=settings.REDIS_URL, prefix=settings.BROADCAST_CHANNEL_PREFIX)
+    if settings.BROADCAST_BACKEND != "memory":
+        raise ValueError(f"Unknown BROADCAST_BACKEND: {settings.BROADCAST_BACKEND}")
+    return InMemoryBackplane()
+
+backplane = create_backplane()
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls into batches.
+    Items are grouped by key; a group is flushed when it reaches max_size items or
+    window_seconds after its first item arrived, whichever comes first.
+    The handler gets (key, items) and returns one result per item, in order; a result
+    that is an exception is raised to that item's caller only.
+    A batch whose callers have all been cancelled is cancelled too.
+    """
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Hashable, list], Awaitable[list]],
+        window_seconds: float,
+        max_size: int
+    ):
+        self.name = name
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_size = max(1, max_size)
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        # id(group) -> task running that group
+        self._running: dict[int, asyncio.Task] = {}
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = []
+            self._timers[key] = loop.call_later(self.window_seconds, self._flush, key)
+        group.append((item, future))
+
+        if len(group) >= self.max_size:
+            self._flush(key)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self._abandon(key, group, future)
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._pending.pop(key, None)
+        if not group:
+            return
+        task = asyncio.create_task(self._run(key, group))
+        # Keep a reference so the task is not garbage-collected mid-flight
+        self._running[id(group)] = task
+        task.add_done_callback(lambda _: self._running.pop(id(group), None))
+
+    def _abandon(self, key: Hashable, group: list, future: asyncio.Future):
+        """A caller went away: drop its item if not sent yet, or cancel a batch nobody waits for."""
+        if self._pending.get(key) is group:
+            group[:] = [entry for entry in group if entry[1] is not future]
+            if not group:
+                self._timers.pop(key).cancel()
+                del self._pending[key]
+            return
+        task = self._running.get(id(group))
+        if task is not None and all(entry[1].cancelled() for entry in group):
+            task.cancel()
+
+    async def _run(self, key: Hashable, group: list[tuple[Any, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(group)
+        try:
+            results = await self.handler(key, [item for item, _ in group])
+            if len(results) != len(group):
+                raise ValueError(f"{self.name} batch returned {len(results)} results for {len(group)} items")
+        except asyncio.CancelledError:
+            for _, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(group, results):
+            # A caller that went away has already cancelled its future
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
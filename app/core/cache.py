@@ -0,0 +1,124 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from app.core.database import AsyncSessionLocal
+from app.models import CacheEntry
+from app.core.metrics import CACHE_LOOKUPS
+
+def make_cache_key(*parts: str) -> str:
+    """
+    Build a stable cache key from the given parts.
+    Parts are joined with a separator that cannot appear in normal text, then hashed.
+    """
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class TTLCache:
+    """
+    In-process LRU cache with a size limit and per-entry expiry.
+    Not shared between workers; use TwoTierCache for that.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: object):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class TwoTierCache:
+    """
+    String cache with an in-process LRU tier in front of a persistent database tier.
+    The database tier survives restarts and is shared by every worker using the same DB.
+    """
+    def __init__(self, namespace: str, max_size: int, ttl_seconds: float, db_ttl_seconds: float):
+        self.namespace = namespace
+        self.memory = TTLCache(max_size, ttl_seconds)
+        self.db_ttl_seconds = db_ttl_seconds
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "writes": 0}
+        CACHE_LOOKUPS.add(lambda: {
+            (namespace, "memory_hit"): self.stats["memory_hits"],
+            (namespace, "db_hit"): self.stats["db_hits"],
+            (namespace, "miss"): self.stats["misses"],
+        })
+
+    async def get(self, key: str) -> str | None:
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+
+        try:
+            async with AsyncSessionLocal() as db:
+                entry = await db.get(CacheEntry, (self.namespace, key))
+        except Exception as e:
+            print(f"Cache Read Error ({self.namespace}): {e}")
+            entry = None
+
+        if entry is not None and not self._is_expired(entry):
+            self.stats["db_hits"] += 1
+            self.memory.set(key, entry.value)
+            return entry.value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.merge(CacheEntry(
+                    namespace=self.namespace,
+                    key=key,
+                    value=value,
+                    created_at=datetime.utcnow()
+                ))
+                await db.commit()
+            self.stats["writes"] += 1
+        except IntegrityError:
+            # Another worker inserted the same key first; its value is just as good.
+            pass
+        except Exception as e:
+            print(f"Cache Write Error ({self.namespace}): {e}")
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "memory_size": len(self.memory),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        if not self.db_ttl_seconds or entry.created_at is None:
+            return False
+        return entry.created_at < datetime.utcnow() - timedelta(seconds=self.db_ttl_seconds)
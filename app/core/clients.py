@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import importlib.util
+import inspect
+import time
+from collections import OrderedDict
+from typing import Callable
+
+# Every registry created in this process, so the app lifespan can close them all
+_registries: list["ClientRegistry"] = []
+
+def http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional 'h2' package (httpx[http2])."""
+    return importlib.util.find_spec("h2") is not None
+
+def key_fingerprint(api_key: str) -> str:
+    """Short hash of an API key, so raw keys are never used as registry keys."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+class ClientRegistry:
+    """
+    Bounded pool of long-lived SDK clients.
+    Reusing a client keeps its HTTP keep-alive connections open across requests.
+    Clients idle for longer than idle_ttl_seconds, or pushed out by max_size, are closed.
+    """
+    def __init__(self, name: str, max_size: int, idle_ttl_seconds: float, close: Callable | None = None):
+        self.name = name
+        self.max_size = max_size
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._close = close
+        self._clients: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._closing: set[asyncio.Task] = set()
+        _registries.append(self)
+
+    def get(self, key: tuple, factory: Callable[[], object]):
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        entry = self._clients.get(key)
+        if entry is not None:
+            client = entry[1]
+        else:
+            client = factory()
+
+        self._clients[key] = (now, client)
+        self._clients.move_to_end(key)
+        while len(self._clients) > self.max_size:
+            _, (_, evicted) = self._clients.popitem(last=False)
+            self._schedule_close(evicted)
+        return client
+
+    async def aclose(self):
+        """Close every pooled client. Called on application shutdown."""
+        clients = [client for _, client in self._clients.values()]
+        self._clients.clear()
+        for client in clients:
+            await self._close_client(client)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _evict_idle(self, now: float):
+        # Entries are kept in least-recently-used order, so stop at the first fresh one
+        while self._clients:
+            key, (last_used, client) = next(iter(self._clients.items()))
+            if now - last_used < self.idle_ttl_seconds:
+                break
+            del self._clients[key]
+            self._schedule_close(client)
+
+    def _schedule_close(self, client: object):
+        if self._close is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No loop to close on; the client is simply garbage collected
+        task = loop.create_task(self._close_client(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_client(self, client: object):
+        if self._close is None:
+            return
+        try:
+            result = self._close(client)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"Client Close Error ({self.name}): {e}")
+
+async def close_all_clients():
+    """Close the clients of every registry in this process."""
+    for registry in _registries:
+        await registry.aclose()
@@ -7,12 +7,124 @@ class Settings(BaseSettings):
     VERSION: str = "0.1.0"
     API_V1_STR: str = "/api/v1"
     
-    # AI Keys
-    OPENAI_API_KEY: str
-    GEMINI_API_KEY: str
+    # AI Keys: optional server defaults; clients can send their own in X-OpenAI-API-Key / X-Gemini-API-Key
+    OPENAI_API_KEY: str = ""
+    GEMINI_API_KEY: str = ""
+
+    # Startup
+    MIGRATE_ON_STARTUP: bool = True # Apply pending schema migrations at boot (or run python -m app.core.schema)
+    WARMUP_ON_STARTUP: bool = False # Import the AI SDKs and build default clients in the background after boot
     
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./nao_medical.db"
+    DB_PROFILE: str = "auto" # auto (from DATABASE_URL), sqlite or postgres
+    DB_ECHO: bool = False # Log every SQL statement (debugging only)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 256 # asyncpg only
+
+    # Session Cache (X-Session-ID lookups)
+    SESSION_CACHE_SIZE: int = 1024
+    SESSION_CACHE_TTL_SECONDS: int = 300
+
+    # Translation Cache
+    TRANSLATION_CACHE_SIZE: int = 2048
+    TRANSLATION_CACHE_TTL_SECONDS: int = 3600
+    TRANSLATION_CACHE_DB_TTL_SECONDS: int = 30 * 24 * 3600
+    TRANSCRIPTION_CACHE_SIZE: int = 256
+    TRANSCRIPTION_CACHE_TTL_SECONDS: int = 3600
+    TRANSCRIPTION_CACHE_DB_TTL_SECONDS: int = 30 * 24 * 3600
+
+    # Translation Model Routing: first matching route wins (set as JSON in the environment).
+    # A route may limit input length (max_chars) and target languages (languages).
+    TRANSLATION_ROUTES: list[dict] = [
+        {"max_chars": 120, "model": "gemini-2.5-flash-lite"},
+        {"model": "gemini-2.5-flash"},
+    ]
+    # Curated phrasebook: stock phrases skip the LLM, glossary terms are pinned in prompts
+    PHRASEBOOK_ENABLED: bool = True
+    PHRASEBOOK_PATH: str = "" # Defaults to app/data/phrasebook.json
+    # Hedged requests: if a call runs past the observed percentile latency, a backup is sent
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 95
+    HEDGE_MIN_SAMPLES: int = 20 # Calls observed per model before hedging starts
+    HEDGE_WINDOW: int = 200 # Recent calls the percentile is computed over
+
+    # Translation Batching (concurrent requests share one multi-segment LLM call)
+    TRANSLATION_BATCH_WINDOW_MS: float = 5 # How long the first request waits for others to join
+    TRANSLATION_BATCH_MAX_SIZE: int = 16 # Segments per call; a full batch is sent immediately
+    # Batches are per session so one prompt never holds two patients' text; opt in to share
+    # calls across sessions (only sensible when every request brings its own API key)
+    TRANSLATION_BATCH_ACROSS_SESSIONS: bool = False
+    CHAT_BATCH_MAX_MESSAGES: int = 200 # Messages accepted by /chat/batch
+
+    # Message Writes (concurrent inserts share one transaction)
+    MESSAGE_WRITE_WINDOW_MS: float = 2 # How long the first insert waits for others to join
+    MESSAGE_WRITE_MAX_BATCH: int = 64 # Rows per transaction; a full batch is written immediately
+
+    # Audio Uploads
+    AUDIO_MAX_UPLOAD_BYTES: int = 25 * 1024 * 1024 # Whisper's file size limit; larger request bodies are cut off with 413
+    AUDIO_CHUNK_SECONDS: int = 30 # Long WAV recordings are split into chunks of at most this length
+    AUDIO_TRANSCRIBE_CONCURRENCY: int = 4 # Chunks sent to Whisper at once per recording
+    AUDIO_SILENCE_THRESHOLD_DB: float = -40.0 # Frames quieter than this (dBFS) count as silence
+    AUDIO_JOB_CONCURRENCY: int = 4 # Jobs transcribed/translated at once per worker
+    AUDIO_JOB_MAX_PENDING: int = 100 # Queued jobs before /audio/jobs returns 503
+    AUDIO_JOB_LEASE_SECONDS: int = 120 # A job whose worker stopped renewing its lease this long can be recovered
+    AUDIO_JOB_SWEEP_SECONDS: int = 60 # How often each worker looks for jobs to recover
+
+    # Retention (a TTL of 0 keeps data forever)
+    RETENTION_ENABLED: bool = True
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 500
+    SESSION_TTL_DAYS: float = 0
+    MESSAGE_TTL_DAYS: float = 0
+    UPLOAD_TTL_DAYS: float = 0
+    ORPHAN_UPLOAD_GRACE_SECONDS: int = 3600 # Unreferenced audio younger than this is kept
+
+    # Static Serving
+    UPLOAD_CACHE_MAX_AGE_SECONDS: int = 365 * 24 * 3600 # Browser caching of stored audio (capped by UPLOAD_TTL_DAYS)
+
+    # AI Client Pool
+    CLIENT_POOL_MAX_SIZE: int = 32
+    CLIENT_POOL_IDLE_TTL_SECONDS: int = 600
+    HTTP2_ENABLED: bool = True
+
+    # Upstream Governor (pacing, retries and circuit breaking for Gemini/OpenAI calls)
+    GEMINI_RATE_PER_MINUTE: float = 60 # Per API key; 0 disables pacing
+    GEMINI_BURST: int = 10
+    GEMINI_MAX_CONCURRENCY: int = 16 # In-flight Gemini calls per worker
+    OPENAI_RATE_PER_MINUTE: float = 50 # Per API key; 0 disables pacing
+    OPENAI_BURST: int = 5
+    OPENAI_MAX_CONCURRENCY: int = 8 # In-flight Whisper calls per worker
+    UPSTREAM_MAX_RETRIES: int = 3
+    UPSTREAM_BACKOFF_BASE_SECONDS: float = 0.5
+    UPSTREAM_BACKOFF_MAX_SECONDS: float = 20 # Longer Retry-After hints fail immediately instead
+    CIRCUIT_FAILURE_THRESHOLD: int = 5 # Consecutive provider errors before failing fast
+    CIRCUIT_RESET_SECONDS: float = 30 # How long to fail fast before trying the provider again
+
+    # Summaries
+    SUMMARY_CHUNK_CHARS: int = 12000 # New history longer than this is map-reduced
+
+    # Bulk Export (/api/export, NDJSON for EHR sync)
+    EXPORT_TOKEN: str = "" # Required in X-Export-Token; the endpoint is disabled while empty
+
+    # Observability
+    METRICS_ENABLED: bool = True # Prometheus text format at /metrics
+    TRACE_HEADERS_ENABLED: bool = True # X-Trace-ID and Server-Timing response headers
+
+    # WebSockets
+    WS_SEND_QUEUE_SIZE: int = 64 # Pending messages per socket before it is evicted
+    WS_REPLAY_BUFFER_SIZE: int = 128 # Recent events kept per session for clients reconnecting with last_seq
+    WS_REPLAY_SESSIONS: int = 1000 # Sessions with a replay buffer; the least recently active are dropped
+
+    # Cross-worker broadcast backplane: "memory" (single process) or "redis"
+    BROADCAST_BACKEND: str = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    BROADCAST_CHANNEL_PREFIX: str = "nao:"
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,13 +1,81 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url, URL
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True, # Log SQL for debugging
-)
+def resolve_profile(url: URL, profile: str) -> str:
+    """Pick the database profile: explicit DB_PROFILE, or inferred from DATABASE_URL."""
+    if profile != "auto":
+        return profile
+    return "postgres" if url.get_backend_name() == "postgresql" else "sqlite"
+
+def sqlite_profile(url: URL) -> tuple[URL, dict]:
+    """
+    SQLite tuned for a concurrent web app: WAL lets readers run alongside the writer,
+    synchronous=NORMAL is durable under WAL, and a busy timeout makes writers wait
+    for the lock instead of failing.
+    """
+    return url, {
+        "connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+    }
+
+# Postgres drivers with asyncio support
+ASYNC_POSTGRES_DRIVERS = ("asyncpg", "psycopg")
+
+def postgres_profile(url: URL) -> tuple[URL, dict]:
+    """
+    Pooled connections with pre-ping; asyncpg (the default driver) also gets a
+    prepared statement cache.
+    """
+    if url.drivername in ("postgres", "postgresql"):
+        url = url.set(drivername="postgresql+asyncpg")
+    driver = url.get_driver_name()
+    if driver not in ASYNC_POSTGRES_DRIVERS:
+        raise ValueError(f"DATABASE_URL driver '{driver}' is not async; use postgresql+asyncpg:// or postgresql+psycopg://")
+    if driver == "asyncpg":
+        # asyncpg-only connect argument; other drivers reject it
+        url = url.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    return url, {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+PROFILES = {
+    "sqlite": sqlite_profile,
+    "postgres": postgres_profile,
+}
+
+def create_engine_for(database_url: str, profile: str = "auto"):
+    url = make_url(database_url)
+    profile = resolve_profile(url, profile)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE: {profile}")
+
+    url, options = PROFILES[profile](url)
+    new_engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO, # Log SQL only when explicitly enabled
+        **options
+    )
+
+    if profile == "sqlite":
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+            cursor.close()
+
+    return new_engine
+
+engine = create_engine_for(settings.DATABASE_URL, settings.DB_PROFILE)
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
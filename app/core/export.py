@@ -0,0 +1,158 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models import ChatSession, ExportWatermark, Message, SummaryCheckpoint
+from app.schemas import message_payload
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 500
+# Output is flushed in chunks of about this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Watermark exports skip messages newer than this, so a transaction that commits a lower
+# id after a higher one (possible on Postgres) is not skipped for good
+SETTLE_SECONDS = 5
+
+async def get_watermark(consumer: str) -> int:
+    async with AsyncSessionLocal() as db:
+        watermark = await db.get(ExportWatermark, consumer)
+        return watermark.last_message_id if watermark else 0
+
+async def save_watermark(consumer: str, last_message_id: int):
+    async with AsyncSessionLocal() as db:
+        watermark = await db.get(ExportWatermark, consumer)
+        if watermark is None:
+            db.add(ExportWatermark(consumer=consumer, last_message_id=last_message_id))
+        elif last_message_id > watermark.last_message_id:
+            watermark.last_message_id = last_message_id
+        await db.commit()
+
+class ConsumerWatermark:
+    """
+    A consumer's position for one export. The export resumes after the saved watermark,
+    and the new one is saved as the response's background task, once the body was sent
+    in full: a client that drops mid-export gets the same messages again next time.
+    """
+    def __init__(self, consumer: str):
+        self.consumer = consumer
+        self.last_message_id = 0
+        self.complete = False
+
+    async def track(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            yield chunk
+        # Reached only after the server sent the last chunk; a disconnect stops the body earlier
+        self.complete = True
+
+    async def __call__(self):
+        # Starlette also runs background tasks after a disconnect on older ASGI servers
+        if self.complete and self.last_message_id:
+            await save_watermark(self.consumer, self.last_message_id)
+
+async def export_records(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    after_id: int | None = None,
+    clinician_id: str | None = None,
+    include_summaries: bool = False,
+    watermark: ConsumerWatermark | None = None
+) -> AsyncIterator[dict]:
+    """
+    Messages grouped by session, as NDJSON-ready records: a "session" record, its
+    "message" records in order, optionally its cached "summary", and a final "end"
+    record with the newest message id exported.
+
+    - start/end: message timestamp range [start, end).
+    - after_id: only messages with a higher id.
+    - watermark: resume after this consumer's last completed export. The newest message id
+      exported is left on it; the caller saves it once the output was delivered.
+
+    Rows are read through a server-side cursor in (session_id, timestamp, id) index order,
+    so memory use does not grow with the export size. Summaries are the cached rolling
+    summaries; no LLM call is made.
+    """
+    if watermark is not None:
+        after_id = max(after_id or 0, await get_watermark(watermark.consumer))
+        settled = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+        end = min(end, settled) if end else settled
+
+    columns = [
+        *Message.__table__.columns,
+        ChatSession.created_at.label("session_created_at"),
+        ChatSession.doctor_lang,
+        ChatSession.patient_lang,
+        ChatSession.clinician_id,
+    ]
+    if include_summaries:
+        columns += [
+            SummaryCheckpoint.summary,
+            SummaryCheckpoint.last_message_id.label("summary_last_message_id"),
+            SummaryCheckpoint.updated_at.label("summary_updated_at"),
+        ]
+
+    stmt = select(*columns).join(ChatSession, ChatSession.id == Message.session_id)
+    if include_summaries:
+        stmt = stmt.outerjoin(SummaryCheckpoint, SummaryCheckpoint.session_id == Message.session_id)
+    if start is not None:
+        stmt = stmt.where(Message.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(Message.timestamp < end)
+    if after_id:
+        stmt = stmt.where(Message.id > after_id)
+    if clinician_id is not None:
+        stmt = stmt.where(ChatSession.clinician_id == clinician_id)
+    stmt = stmt.order_by(Message.session_id, Message.timestamp, Message.id)
+
+    sessions = messages = last_message_id = 0
+    current = None
+    pending_summary = None
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_FETCH_SIZE))
+        async for row in result:
+            if row.session_id != current:
+                if pending_summary:
+                    yield pending_summary
+                current = row.session_id
+                sessions += 1
+                yield {
+                    "type": "session",
+                    "id": row.session_id,
+                    "created_at": row.session_created_at.isoformat(),
+                    "doctor_lang": row.doctor_lang,
+                    "patient_lang": row.patient_lang,
+                    "clinician_id": row.clinician_id
+                }
+                pending_summary = {
+                    "type": "summary",
+                    "session_id": row.session_id,
+                    "summary": row.summary,
+                    "last_message_id": row.summary_last_message_id,
+                    "updated_at": row.summary_updated_at.isoformat() if row.summary_updated_at else None
+                } if include_summaries and row.summary else None
+
+            messages += 1
+            last_message_id = max(last_message_id, row.id)
+            yield {"type": "message", **message_payload(row)}
+
+    if pending_summary:
+        yield pending_summary
+    if watermark is not None:
+        watermark.last_message_id = last_message_id
+    yield {"type": "end", "sessions": sessions, "messages": messages, "last_message_id": last_message_id or after_id}
+
+async def ndjson_chunks(records: AsyncIterator[dict], compress: bool = False) -> AsyncIterator[bytes]:
+    """Encode records as NDJSON in ~EXPORT_CHUNK_BYTES chunks, optionally as one gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None # wbits=31: gzip container
+    buffer = bytearray()
+    async for record in records:
+        buffer += json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+            buffer.clear()
+            if chunk:
+                yield chunk
+    tail = compressor.compress(bytes(buffer)) + compressor.flush() if compressor else bytes(buffer)
+    if tail:
+        yield tail
@@ -0,0 +1,338 @@
+import asyncio
+import random
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from app.core.clients import ClientRegistry, key_fingerprint
+from app.core.config import get_settings
+from app.core.metrics import CallbackMetric, Counter, Histogram
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Retry hints Gemini puts in the error text, e.g. "Please retry in 12.5s" or "'retryDelay': '12s'"
+_RETRY_HINT = re.compile(r"retry(?:\s+in|delay['\"]?\s*:\s*['\"]?)\s*(\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+
+UPSTREAM_SECONDS = Histogram(
+    "nao_upstream_request_duration_seconds",
+    "Duration of single upstream AI requests (one attempt each).",
+    ("provider", "outcome")
+)
+UPSTREAM_RETRIES = Counter("nao_upstream_retries_total", "Upstream requests retried after an error.", ("provider",))
+UPSTREAM_REJECTED = Counter("nao_upstream_rejected_total", "Calls failed fast by an open circuit.", ("provider",))
+CIRCUIT_OPEN = CallbackMetric("nao_upstream_circuit_open", "1 while the provider's circuit is open or half-open.", "gauge", ("provider",))
+
+class UpstreamUnavailable(Exception):
+    """The circuit is open: the provider is failing and calls are rejected without being sent."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is temporarily unavailable, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+def status_code(e: BaseException) -> int | None:
+    """HTTP status of an SDK error (OpenAI, google-genai, httpx), following wrapped causes."""
+    while e is not None:
+        for candidate in (getattr(e, "status_code", None), getattr(e, "code", None),
+                          getattr(getattr(e, "response", None), "status_code", None)):
+            if isinstance(candidate, int):
+                return candidate
+        e = e.__cause__ or e.__context__
+    return None
+
+def is_quota_error(e: BaseException) -> bool:
+    if status_code(e) == 429:
+        return True
+    error_msg = str(e).lower()
+    return "429" in error_msg or "quota" in error_msg or "exhausted" in error_msg
+
+def is_retryable(e: BaseException) -> bool:
+    if isinstance(e, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = status_code(e)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    error_msg = str(e).lower()
+    return is_quota_error(e) or "timeout" in error_msg or "timed out" in error_msg or "unavailable" in error_msg
+
+def retry_after(e: BaseException) -> float | None:
+    """Seconds the provider asked us to wait, from a Retry-After header or the error text."""
+    while e is not None:
+        headers = getattr(getattr(e, "response", None), "headers", None)
+        value = headers.get("retry-after") if headers is not None else None
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass # HTTP-date form; fall back to backoff
+        match = _RETRY_HINT.search(str(e))
+        if match:
+            return float(match.group(1))
+        e = e.__cause__ or e.__context__
+    return None
+
+class TokenBucket:
+    """
+    Paces calls to rate_per_second with bursts of up to `burst`.
+    pause() stops every caller until the provider's Retry-After has passed.
+    """
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive provider failures and rejects calls for
+    reset_seconds. Then one trial call is let through: success closes it, failure reopens it.
+    before_call() tells the caller whether it owns the trial; pass that back with the outcome,
+    so calls admitted earlier that finish during half-open do not free the trial slot.
+    """
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self, name: str) -> bool:
+        """Admit a call or raise UpstreamUnavailable. True when the call is the half-open trial."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_running):
+            raise UpstreamUnavailable(name, self._remaining())
+        if state == "half_open":
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self, trial: bool):
+        self.failures = 0
+        self.opened_at = None
+        if trial:
+            self._trial_running = False
+
+    def record_failure(self, trial: bool):
+        self.failures += 1
+        if trial or (self.failure_threshold and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+        if trial:
+            self._trial_running = False
+
+    def release(self, trial: bool):
+        """The call ended without a verdict on provider health (e.g. a client error)."""
+        if trial:
+            self._trial_running = False
+
+    def _remaining(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(1.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+class UpstreamGovernor:
+    """
+    Shared gate in front of one AI provider:
+    - a token bucket per API key (rate_per_minute, 0 disables pacing),
+    - a concurrency limit for the whole process,
+    - retries with full-jitter exponential backoff that honor Retry-After,
+    - a circuit breaker that fails fast with UpstreamUnavailable while the provider is down.
+    Rate limits (429) are retried but never trip the breaker: they are about our quota, not provider health.
+    """
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: float,
+        burst: int,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base_seconds: float,
+        backoff_max_seconds: float,
+        failure_threshold: int,
+        reset_seconds: float
+    ):
+        self.name = name
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._buckets = ClientRegistry(
+            f"{name}-buckets",
+            max_size=settings.CLIENT_POOL_MAX_SIZE,
+            idle_ttl_seconds=settings.CLIENT_POOL_IDLE_TTL_SECONDS
+        )
+        self.retries = 0
+        self.rejected = 0
+        CIRCUIT_OPEN.add(lambda: {(self.name,): 0 if self.breaker.state == "closed" else 1})
+
+    async def call(self, api_key: str | None, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() (which makes one upstream request) under pacing, retries and the breaker."""
+        attempt = 0
+        while True:
+            try:
+                async with self._slot(api_key):
+                    return await fn()
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(api_key, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def stream(self, api_key: str | None, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Like call() for streaming responses. Only retried until the first item was yielded."""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._slot(api_key):
+                    async for item in fn():
+                        started = True
+                        yield item
+                return
+            except Exception as e:
+                attempt += 1
+                delay = None if started else self._retry_delay(api_key, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retries,
+            "rejected": self.rejected
+        }
+
+    def _slot(self, api_key: str | None) -> "_Slot":
+        if self._semaphore is None:
+            # Created lazily so it belongs to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return _Slot(self, self._bucket(api_key))
+
+    def _bucket(self, api_key: str | None) -> TokenBucket | None:
+        if self.rate_per_second <= 0:
+            return None
+        key = key_fingerprint(api_key) if api_key else "default"
+        return self._buckets.get((key,), lambda: TokenBucket(self.rate_per_second, self.burst))
+
+    def _retry_delay(self, api_key: str | None, e: Exception, attempt: int) -> float | None:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if isinstance(e, UpstreamUnavailable) or attempt > self.max_retries or not is_retryable(e):
+            return None
+
+        hinted = retry_after(e)
+        if hinted is not None:
+            if hinted > self.backoff_max_seconds:
+                return None # e.g. a daily quota: waiting would only hold the request open
+            if is_quota_error(e):
+                bucket = self._bucket(api_key)
+                if bucket is not None:
+                    bucket.pause(hinted) # Everyone on this key waits, instead of piling on more 429s
+            delay = hinted
+        else:
+            # Full jitter spreads retries from concurrent callers
+            delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1)))
+
+        self.retries += 1
+        UPSTREAM_RETRIES.inc(provider=self.name)
+        print(f"Upstream Retry ({self.name}, attempt {attempt}, {delay:.2f}s): {e}")
+        return delay
+
+class _Slot:
+    """One upstream attempt: breaker check, rate token, concurrency slot, then outcome bookkeeping."""
+    def __init__(self, governor: UpstreamGovernor, bucket: TokenBucket | None):
+        self.governor = governor
+        self.bucket = bucket
+
+    async def __aenter__(self):
+        governor = self.governor
+        try:
+            self.trial = governor.breaker.before_call(governor.name)
+        except UpstreamUnavailable:
+            governor.rejected += 1
+            UPSTREAM_REJECTED.inc(provider=governor.name)
+            raise
+        try:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            await governor._semaphore.acquire()
+        except BaseException:
+            governor.breaker.release(self.trial)
+            raise
+        self.started = time.perf_counter()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        governor = self.governor
+        governor._semaphore.release()
+        if exc is None:
+            outcome = "ok"
+        elif isinstance(exc, asyncio.CancelledError):
+            outcome = "cancelled" # Caller went away or a hedged twin won
+        else:
+            outcome = "rate_limited" if isinstance(exc, Exception) and is_quota_error(exc) else "error"
+        UPSTREAM_SECONDS.observe(time.perf_counter() - self.started, provider=governor.name, outcome=outcome)
+        if exc is None:
+            governor.breaker.record_success(self.trial)
+        elif isinstance(exc, Exception) and is_retryable(exc) and not is_quota_error(exc):
+            governor.breaker.record_failure(self.trial)
+        else:
+            governor.breaker.release(self.trial)
+        return False
+
+gemini_governor = UpstreamGovernor(
+    "gemini",
+    rate_per_minute=settings.GEMINI_RATE_PER_MINUTE,
+    burst=settings.GEMINI_BURST,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_retries=settings.UPSTREAM_MAX_RETRIES,
+    backoff_base_seconds=settings.UPSTREAM_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.UPSTREAM_BACKOFF_MAX_SECONDS,
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.CIRCUIT_RESET_SECONDS
+)
+
+openai_governor = UpstreamGovernor(
+    "openai",
+    rate_per_minute=settings.OPENAI_RATE_PER_MINUTE,
+    burst=settings.OPENAI_BURST,
+    max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+    max_retries=settings.UPSTREAM_MAX_RETRIES,
+    backoff_base_seconds=settings.UPSTREAM_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.UPSTREAM_BACKOFF_MAX_SECONDS,
+    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.CIRCUIT_RESET_SECONDS
+)
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Awaitable, Callable
+
+class JobQueueFull(Exception):
+    pass
+
+class JobQueue:
+    """
+    Bounded asyncio worker pool.
+    Job state lives in the database; the queue only carries job IDs (plus in-memory
+    extras such as user API keys, which are never persisted).
+    """
+    def __init__(self, name: str, handler: Callable[..., Awaitable[None]], concurrency: int, max_pending: int):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue[tuple[str, dict]] | None = None
+        self._workers: list[asyncio.Task] = []
+        # IDs waiting in the queue, so a recovery sweep does not enqueue them twice
+        self._queued: set[str] = set()
+
+    def submit(self, job_id: str, **extras):
+        """
+        Enqueue without waiting; a job already waiting here is not added again.
+        Raises JobQueueFull when the backlog is at capacity.
+        """
+        if self._queue is None:
+            raise RuntimeError(f"{self.name} queue is not started")
+        if job_id in self._queued:
+            return
+        try:
+            self._queue.put_nowait((job_id, extras))
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"{self.name} queue is full")
+        self._queued.add(job_id)
+
+    async def start(self):
+        # Created here so the queue belongs to the running event loop
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._queued = set()
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        # Unfinished jobs keep their persisted status and are recovered on the next start
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _work(self):
+        while True:
+            job_id, extras = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self.handler(job_id, **extras)
+            except Exception as e:
+                print(f"Job Error ({self.name} {job_id}): {e}")
+            finally:
+                self._queue.task_done()
@@ -1,20 +1,141 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
 from app.core.config import get_settings
+from app.core.clients import ClientRegistry, http2_available, key_fingerprint
+from app.core.metrics import Counter
 
 settings = get_settings()
 
+T = TypeVar("T")
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+HEDGES = Counter(
+    "nao_hedged_requests_total",
+    "Backup requests fired because a call ran past its latency percentile, and how many of them won.",
+    ("model", "outcome")
+)
+
+async def _close_llm(llm):
+    aclose = getattr(llm, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+# One Gemini client per (API key, model, temperature), reused across requests
+_llm_clients = ClientRegistry(
+    "gemini",
+    max_size=settings.CLIENT_POOL_MAX_SIZE,
+    idle_ttl_seconds=settings.CLIENT_POOL_IDLE_TTL_SECONDS,
+    close=_close_llm
+)
+# Prompt | LLM | parser chains, built once per (prompt, pooled LLM)
+_chains = ClientRegistry(
+    "chains",
+    max_size=settings.CLIENT_POOL_MAX_SIZE * 4,
+    idle_ttl_seconds=settings.CLIENT_POOL_IDLE_TTL_SECONDS
+)
+
 def get_llm(api_key: str | None = None, model: str = "gemini-2.5-flash", temperature: float = 0.1):
     """
-    Get a Gemini LLM instance. 
+    Get a pooled Gemini LLM instance.
     If api_key is provided, use it. Otherwise use the server default.
     """
     final_key = api_key if api_key else settings.GEMINI_API_KEY
-    
+
     if not final_key:
         raise ValueError("No Gemini API key provided. Service cannot function.")
-        
-    return ChatGoogleGenerativeAI(
-        model=model,
-        google_api_key=final_key,
-        temperature=temperature
-    )
+
+    def build():
+        # Imported on first use: the Gemini SDK dominates cold-start import time
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        client_args = {"http2": True} if settings.HTTP2_ENABLED and http2_available() else None
+        return ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=final_key,
+            temperature=temperature,
+            client_args=client_args,
+            max_retries=0 # Retries and backoff are handled by the upstream governor
+        )
+
+    return _llm_clients.get((key_fingerprint(final_key), model, temperature), build)
+
+def get_chain(prompt, api_key: str | None = None, model: str = "gemini-2.5-flash", temperature: float = 0.1):
+    """
+    Get a reusable `prompt | llm | StrOutputParser()` chain on top of the pooled LLM.
+    """
+    from langchain_core.output_parsers import StrOutputParser
+
+    llm = get_llm(api_key=api_key, model=model, temperature=temperature)
+    # The cached chain holds a reference to its LLM, so id(llm) cannot be reused while it is pooled
+    return _chains.get((id(prompt), id(llm)), lambda: prompt | llm | StrOutputParser())
+
+def route_model(text: str, target_lang: str, routes: list[dict] | None = None) -> str:
+    """
+    Pick the model tier for a translation from TRANSLATION_ROUTES: the first route whose
+    max_chars and languages (both optional) match the input wins.
+    """
+    for route in settings.TRANSLATION_ROUTES if routes is None else routes:
+        max_chars = route.get("max_chars")
+        if max_chars is not None and len(text) > max_chars:
+            continue
+        languages = route.get("languages")
+        if languages and target_lang.lower() not in {lang.lower() for lang in languages}:
+            continue
+        return route["model"]
+    return DEFAULT_MODEL
+
+class LatencyTracker:
+    """Recent successful call durations for one kind of call, to derive the hedge delay."""
+    def __init__(self, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self.samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        values = sorted(self.samples)
+        return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+_latency: dict[str, LatencyTracker] = {}
+
+async def hedged(key: str, call: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run call(). If it is still running after the HEDGE_PERCENTILE latency observed for `key`,
+    start an identical backup call; the first to succeed wins and the other is cancelled.
+    Cancelling the caller cancels both.
+    """
+    tracker = _latency.get(key)
+    if tracker is None:
+        tracker = _latency[key] = LatencyTracker(settings.HEDGE_WINDOW)
+    delay = tracker.percentile(settings.HEDGE_PERCENTILE) if settings.HEDGE_ENABLED else None
+
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.add(asyncio.ensure_future(call()))
+                HEDGES.inc(model=key, outcome="fired")
+
+        while True:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    tracker.record(time.perf_counter() - start)
+                    if task is not primary:
+                        HEDGES.inc(model=key, outcome="won")
+                    return task.result()
+            if not tasks:
+                # Every attempt failed (each already retried by the governor)
+                raise done.pop().exception()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,144 @@
+import asyncio
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.batching import MicroBatcher
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models import AudioJob, ChatSession, Message, SummaryCheckpoint
+
+settings = get_settings()
+
+async def list_messages(
+    db: AsyncSession,
+    session_id: str,
+    after_id: int | None = None,
+    limit: int | None = None,
+    tail: int | None = None
+) -> list[Message]:
+    """
+    Messages of a session in (timestamp, id) order, read through the
+    (session_id, timestamp, id) index.
+
+    - after_id: keyset pagination, only messages after that message.
+    - limit: page size.
+    - tail: only the newest N messages (still returned oldest first).
+    """
+    stmt = select(Message).where(Message.session_id == session_id)
+
+    if after_id is not None:
+        anchor = await db.scalar(
+            select(Message.timestamp).where(Message.id == after_id, Message.session_id == session_id)
+        )
+        if anchor is not None:
+            stmt = stmt.where(or_(
+                Message.timestamp > anchor,
+                and_(Message.timestamp == anchor, Message.id > after_id)
+            ))
+        else:
+            # Anchor row was deleted (e.g. by retention); ids are still increasing
+            stmt = stmt.where(Message.id > after_id)
+
+    if tail is not None:
+        result = await db.execute(
+            stmt.order_by(Message.timestamp.desc(), Message.id.desc()).limit(tail)
+        )
+        return list(reversed(result.scalars().all()))
+
+    stmt = stmt.order_by(Message.timestamp, Message.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+async def messages_since(session_id: str, after_id: int) -> list[Message] | None:
+    """
+    Messages a reconnecting client is missing, after the newest one it holds.
+    None when that message is gone (history cleared or expired): the client must reload.
+    """
+    async with AsyncSessionLocal() as db:
+        anchor = await db.scalar(
+            select(Message.id).where(Message.id == after_id, Message.session_id == session_id)
+        )
+        if anchor is None:
+            return None
+        return await list_messages(db, session_id, after_id=after_id)
+
+async def clear_session_messages(db: AsyncSession, session_ids: list[str]):
+    """
+    Delete every message of the given sessions with set-based statements
+    (no rows are loaded into the ORM). The caller commits.
+    Audio files left unreferenced are removed later by the retention service.
+    """
+    # Jobs keep their history but no longer point at deleted messages
+    await db.execute(
+        update(AudioJob).where(AudioJob.session_id.in_(session_ids)).values(message_id=None)
+    )
+    # The rolling summary covered the deleted messages
+    await db.execute(delete(SummaryCheckpoint).where(SummaryCheckpoint.session_id.in_(session_ids)))
+    await db.execute(delete(Message).where(Message.session_id.in_(session_ids)))
+
+async def delete_sessions(db: AsyncSession, session_ids: list[str]):
+    """Delete sessions together with their messages, summaries and jobs. The caller commits."""
+    await clear_session_messages(db, session_ids)
+    await db.execute(delete(AudioJob).where(AudioJob.session_id.in_(session_ids)))
+    await db.execute(delete(ChatSession).where(ChatSession.id.in_(session_ids)))
+
+async def _insert_messages(db: AsyncSession, rows: list[dict]) -> list[Message]:
+    """One INSERT ... RETURNING for all rows; ids and timestamps come back without a refresh."""
+    stmt = insert(Message).returning(Message, sort_by_parameter_order=True)
+    result = await db.scalars(stmt, rows)
+    return list(result.all())
+
+class MessageWriter:
+    """
+    Group commit for new messages: inserts that arrive within a short window share one
+    INSERT ... RETURNING and one transaction (one fsync) instead of a commit and a refresh each.
+    Every caller gets its own persisted row back.
+    """
+    def __init__(self, window_seconds: float, max_size: int):
+        self._batcher = MicroBatcher("message_writes", self._write, window_seconds, max_size)
+
+    async def add(self, **values) -> Message:
+        """Persist one message (column values as keywords) and return it with id and timestamp set."""
+        # Shielded: a caller that goes away must not roll back the other messages in its batch
+        return await asyncio.shield(self._batcher.submit(None, values))
+
+    async def add_many(self, rows: list[dict]) -> list[Message]:
+        """
+        Persist messages that belong together (e.g. a /chat/batch request) with one
+        INSERT ... RETURNING in one transaction, so ids and timestamps follow their order.
+        """
+        results = await asyncio.shield(self._write(None, rows))
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def stats(self) -> dict:
+        return self._batcher.stats()
+
+    async def _write(self, _key, rows: list[dict]) -> list:
+        async with AsyncSessionLocal() as db:
+            try:
+                messages = await _insert_messages(db, rows)
+                await db.commit()
+                return messages
+            except IntegrityError:
+                # One bad row (e.g. its session was just deleted) must not fail the rest
+                await db.rollback()
+
+            results = []
+            for row in rows:
+                try:
+                    results.append((await _insert_messages(db, [row]))[0])
+                    await db.commit()
+                except IntegrityError as e:
+                    await db.rollback()
+                    results.append(e)
+            return results
+
+message_writer = MessageWriter(
+    window_seconds=settings.MESSAGE_WRITE_WINDOW_MS / 1000,
+    max_size=settings.MESSAGE_WRITE_MAX_BATCH
+)
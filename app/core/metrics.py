@@ -0,0 +1,241 @@
+import re
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable
+from fastapi import Request
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TRACE_HEADER = "X-Trace-ID"
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Set per HTTP request by metrics_middleware
+_trace_id: ContextVar[str | None] = ContextVar("trace_id", default=None)
+_timings: ContextVar[list | None] = ContextVar("stage_timings", default=None)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base class: a named family of series keyed by label values."""
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self._samples()]
+
+    def _samples(self) -> list[str]:
+        return []
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class CallbackMetric(Metric):
+    """
+    Values read at scrape time from the objects that already track them (cache stats,
+    open sockets), so hot paths pay nothing. Each collector returns {label values: value}.
+    """
+    def __init__(self, name: str, help: str, type: str, labelnames: tuple[str, ...] = ()):
+        self.type = type
+        self._collectors: list[Callable[[], dict[tuple, float]]] = []
+        super().__init__(name, help, labelnames)
+
+    def add(self, collector: Callable[[], dict[tuple, float]]):
+        self._collectors.append(collector)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                print(f"Metrics Error ({self.name}): {e}")
+                continue
+            for key, value in values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = Histogram(
+    "nao_stage_duration_seconds",
+    "Time spent in each request stage.",
+    ("stage", "model", "lang_pair")
+)
+STAGE_ERRORS = Counter(
+    "nao_stage_errors_total",
+    "Stages that ended with an exception.",
+    ("stage", "model", "lang_pair")
+)
+HTTP_REQUESTS = Counter(
+    "nao_http_requests_total",
+    "HTTP requests by route and status code.",
+    ("method", "route", "status")
+)
+HTTP_SECONDS = Histogram(
+    "nao_http_request_duration_seconds",
+    "Time until the response headers were sent.",
+    ("method", "route")
+)
+CACHE_LOOKUPS = CallbackMetric(
+    "nao_cache_lookups_total",
+    "Cache lookups by cache and result (memory_hit, db_hit, miss).",
+    "counter",
+    ("cache", "result")
+)
+WEBSOCKET_CONNECTIONS = CallbackMetric(
+    "nao_websocket_connections",
+    "WebSocket connections open on this worker.",
+    "gauge"
+)
+WEBSOCKET_RESUMES = Counter(
+    "nao_websocket_resumes_total",
+    "Reconnects with last_seq by how they caught up (current, replay, database).",
+    ("source",)
+)
+
+@contextmanager
+def stage(name: str, model: str = "", lang_pair: str = ""):
+    """Time one stage of a request into STAGE_SECONDS (and the request's Server-Timing header)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name, model=model, lang_pair=lang_pair)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name, model=model, lang_pair=lang_pair)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+def lang_pair(source_lang: str | None, target_lang: str | None) -> str:
+    return f"{(source_lang or 'auto').lower()}-{(target_lang or '').lower()}"
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+def _server_timing(timings: list) -> str:
+    # Repeated stages (e.g. several broadcasts) are summed into one entry
+    totals: dict[str, float] = {}
+    for name, elapsed in timings:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items())
+
+def make_metrics_middleware(trace_headers: bool):
+    """
+    HTTP middleware recording request counts and latency by route template.
+    With trace_headers, each response carries an X-Trace-ID (the caller's, if it sent a valid one)
+    and a Server-Timing header with the stages that ran for that request.
+    """
+    async def metrics_middleware(request: Request, call_next):
+        incoming = request.headers.get(TRACE_HEADER)
+        trace_id = incoming if incoming and _VALID_TRACE_ID.match(incoming) else uuid.uuid4().hex
+        trace_token = _trace_id.set(trace_id)
+        timings_token = _timings.set([])
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            if trace_headers:
+                response.headers[TRACE_HEADER] = trace_id
+                timings = _timings.get()
+                if timings:
+                    response.headers["Server-Timing"] = _server_timing(timings)
+            return response
+        finally:
+            route = request.scope.get("route")
+            # Route templates keep label cardinality bounded
+            route_path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(method=request.method, route=route_path, status=status)
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route_path)
+            _timings.reset(timings_token)
+            _trace_id.reset(trace_token)
+
+    return metrics_middleware
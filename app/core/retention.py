@@ -0,0 +1,213 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, tuple_, update
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.core.messages import delete_sessions
+from app.core.session_cache import session_cache
+from app.core.storage import UPLOAD_DIR
+from app.models import AudioJob, CacheEntry, ChatSession, Message
+
+settings = get_settings()
+
+class RetentionService:
+    """
+    Background task that keeps disk and database size bounded.
+    Each pass purges expired sessions, messages and cache entries in batches, then
+    garbage-collects audio files that are expired or no longer referenced.
+    A TTL of 0 disables that kind of expiry.
+    """
+    def __init__(
+        self,
+        interval_seconds: float,
+        batch_size: int,
+        session_ttl_days: float = 0,
+        message_ttl_days: float = 0,
+        upload_ttl_days: float = 0,
+        orphan_grace_seconds: float = 3600,
+        cache_ttl_seconds: float = 0
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.session_ttl_days = session_ttl_days
+        self.message_ttl_days = message_ttl_days
+        self.upload_ttl_days = upload_ttl_days
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> dict:
+        """One full pass. Returns how much was removed."""
+        stats = {
+            "sessions": await self.purge_sessions(),
+            "messages": await self.purge_messages(),
+            "cache_entries": await self.purge_cache(),
+        }
+        stats["uploads"] = await self.collect_uploads()
+        return stats
+
+    async def purge_sessions(self) -> int:
+        if not self.session_ttl_days:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=self.session_ttl_days)
+
+        async def delete_batch(db, session_ids):
+            await delete_sessions(db, session_ids)
+            await db.commit()
+            await session_cache.invalidate(*session_ids)
+
+        return await self._in_batches(
+            select(ChatSession.id).where(ChatSession.created_at < cutoff),
+            delete_batch
+        )
+
+    async def purge_messages(self) -> int:
+        if not self.message_ttl_days:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=self.message_ttl_days)
+
+        async def delete_batch(db, message_ids):
+            await db.execute(
+                update(AudioJob).where(AudioJob.message_id.in_(message_ids)).values(message_id=None)
+            )
+            await db.execute(delete(Message).where(Message.id.in_(message_ids)))
+
+        return await self._in_batches(
+            select(Message.id).where(Message.timestamp < cutoff),
+            delete_batch
+        )
+
+    async def purge_cache(self) -> int:
+        if not self.cache_ttl_seconds:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.cache_ttl_seconds)
+        total = 0
+        while True:
+            batch = (
+                select(CacheEntry.namespace, CacheEntry.key)
+                .where(CacheEntry.created_at < cutoff)
+                .limit(self.batch_size)
+            )
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(CacheEntry).where(tuple_(CacheEntry.namespace, CacheEntry.key).in_(batch))
+                )
+                await db.commit()
+            total += result.rowcount
+            if result.rowcount < self.batch_size:
+                return total
+            await asyncio.sleep(0) # Let request handlers run between batches
+
+    async def collect_uploads(self) -> int:
+        """
+        Delete audio files that are unreferenced (after a grace period, so uploads that are
+        still being processed survive) or older than the upload TTL.
+        """
+        referenced = await self._referenced_uploads()
+        now = time.time()
+        orphan_cutoff = now - self.orphan_grace_seconds
+        expiry_cutoff = now - self.upload_ttl_days * 86400 if self.upload_ttl_days else None
+
+        files = await asyncio.to_thread(_scan_uploads)
+        doomed, expired_urls = [], []
+        for path, url, mtime in files:
+            if expiry_cutoff is not None and mtime < expiry_cutoff:
+                doomed.append(path)
+                if url in referenced:
+                    expired_urls.append(url)
+            elif url not in referenced and mtime < orphan_cutoff:
+                doomed.append(path)
+
+        # Drop links to expired audio before the files disappear
+        for start in range(0, len(expired_urls), self.batch_size):
+            batch = expired_urls[start:start + self.batch_size]
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(Message).where(Message.audio_url.in_(batch)).values(audio_url=None))
+                await db.commit()
+
+        return await asyncio.to_thread(_remove_files, doomed)
+
+    async def _referenced_uploads(self) -> set[str]:
+        referenced = set()
+        async with AsyncSessionLocal() as db:
+            for column in (Message.audio_url, AudioJob.audio_url):
+                result = await db.stream_scalars(select(column).where(column.is_not(None)).distinct())
+                async for url in result:
+                    referenced.add(url)
+        return referenced
+
+    async def _in_batches(self, id_query, delete_batch) -> int:
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                ids = (await db.execute(id_query.limit(self.batch_size))).scalars().all()
+                if ids:
+                    await delete_batch(db, ids)
+                    await db.commit()
+            total += len(ids)
+            if len(ids) < self.batch_size:
+                return total
+            await asyncio.sleep(0) # Let request handlers run between batches
+
+    async def _loop(self):
+        while True:
+            try:
+                stats = await self.run_once()
+                if any(stats.values()):
+                    print(f"Retention: removed {stats}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Retention Error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+def _scan_uploads() -> list[tuple[str, str, float]]:
+    """
+    (path, public URL, mtime) of every file under UPLOAD_DIR. Leftover .part files from
+    aborted uploads are never referenced, so they are collected after the grace period.
+    """
+    files = []
+    for root, _, names in os.walk(UPLOAD_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            relative_path = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+            files.append((path, f"/uploads/{relative_path}", mtime))
+    return files
+
+def _remove_files(paths: list[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+retention_service = RetentionService(
+    interval_seconds=settings.RETENTION_INTERVAL_SECONDS,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+    session_ttl_days=settings.SESSION_TTL_DAYS,
+    message_ttl_days=settings.MESSAGE_TTL_DAYS,
+    upload_ttl_days=settings.UPLOAD_TTL_DAYS,
+    orphan_grace_seconds=settings.ORPHAN_UPLOAD_GRACE_SECONDS,
+    cache_ttl_seconds=settings.TRANSLATION_CACHE_DB_TTL_SECONDS
+)
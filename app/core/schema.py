@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations.
+The applied version is kept in schema_migrations, so a boot on an up-to-date database
+costs one query instead of a create_all pass over every table.
+Run ahead of a deploy with: python -m app.core.schema
+"""
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.core.database import Base
+from app.core.search import install_search_index
+import app.models # Registers the models on Base.metadata for bootstrap()
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied_at", DateTime, default=datetime.utcnow)
+)
+
+# Serializes migrations across workers booting at the same time (Postgres only;
+# SQLite writers are already serialized by the database lock)
+_ADVISORY_LOCK_ID = 0x6E616F
+
+# Tables as of the first versioned release. Frozen: later model changes go into new migrations
+_BASELINE = MetaData()
+Table(
+    "sessions", _BASELINE,
+    Column("id", String, primary_key=True),
+    Column("created_at", DateTime),
+    Column("doctor_lang", String),
+    Column("patient_lang", String),
+    Column("clinician_id", String, index=True)
+)
+Table(
+    "messages", _BASELINE,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("session_id", String, ForeignKey("sessions.id")),
+    Column("role", String),
+    Column("original_text", Text),
+    Column("translated_text", Text),
+    Column("audio_url", String),
+    Column("timestamp", DateTime),
+    Index("ix_messages_session_ts_id", "session_id", "timestamp", "id")
+)
+Table(
+    "cache_entries", _BASELINE,
+    Column("namespace", String, primary_key=True),
+    Column("key", String, primary_key=True),
+    Column("value", Text),
+    Column("created_at", DateTime)
+)
+Table(
+    "summary_checkpoints", _BASELINE,
+    Column("session_id", String, ForeignKey("sessions.id"), primary_key=True),
+    Column("summary", Text),
+    Column("last_message_id", Integer),
+    Column("updated_at", DateTime)
+)
+Table(
+    "audio_jobs", _BASELINE,
+    Column("id", String, primary_key=True),
+    Column("session_id", String, ForeignKey("sessions.id")),
+    Column("role", String),
+    Column("status", String),
+    Column("audio_path", String),
+    Column("audio_url", String),
+    Column("audio_hash", String),
+    Column("transcription", Text),
+    Column("translation", Text),
+    Column("message_id", Integer, ForeignKey("messages.id")),
+    Column("error", Text),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime)
+)
+
+def add_column(sync_conn, table_name: str, column: Column):
+    """
+    ALTER TABLE ... ADD COLUMN, skipped when the column already exists.
+    Only nullable columns can be added to a table that may hold rows; anything else raises.
+    """
+    existing = {col["name"] for col in inspect(sync_conn).get_columns(table_name)}
+    if column.name in existing:
+        return
+    if not column.nullable or column.primary_key:
+        raise RuntimeError(f"Cannot add {table_name}.{column.name}: only nullable columns can be added in place")
+    quote = sync_conn.dialect.identifier_preparer.quote
+    col_type = column.type.compile(dialect=sync_conn.dialect)
+    sync_conn.exec_driver_sql(f"ALTER TABLE {quote(table_name)} ADD COLUMN {quote(column.name)} {col_type}")
+
+def _baseline(sync_conn):
+    _BASELINE.create_all(sync_conn) # Skips tables that exist
+    # Databases created before versioning: sessions predate clinician_id, and
+    # create_all only adds indexes to the tables it creates
+    add_column(sync_conn, "sessions", Column("clinician_id", String))
+    for table in _BASELINE.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+async def baseline(conn: AsyncConnection):
+    """
+    Tables, indexes and the full-text index as of the first versioned release.
+    Also upgrades databases created before versioning, when the schema was synced on every boot.
+    """
+    await conn.run_sync(_baseline)
+    await install_search_index(conn)
+
+async def add_export_watermarks(conn: AsyncConnection):
+    watermarks = Table(
+        "export_watermarks", MetaData(),
+        Column("consumer", String, primary_key=True),
+        Column("last_message_id", Integer),
+        Column("exported_at", DateTime)
+    )
+    await conn.run_sync(lambda sync_conn: watermarks.create(sync_conn, checkfirst=True))
+
+def _add_audio_job_leases(sync_conn):
+    add_column(sync_conn, "audio_jobs", Column("claimed_by", String))
+    add_column(sync_conn, "audio_jobs", Column("lease_expires_at", DateTime))
+
+async def add_audio_job_leases(conn: AsyncConnection):
+    await conn.run_sync(_add_audio_job_leases)
+
+# (version, name, step) in order. Append new migrations; never edit one that has shipped.
+# Steps spell out their own DDL instead of reading the models, so they do the same thing
+# whenever they run. A database without schema_migrations runs every step from the first,
+# so steps must tolerate already being applied. A new database skips them: see bootstrap().
+MIGRATIONS: list[tuple[int, str, Callable[[AsyncConnection], Awaitable]]] = [
+    (1, "baseline", baseline),
+    (2, "export watermarks", add_export_watermarks),
+    (3, "audio job leases", add_audio_job_leases),
+]
+
+async def bootstrap(conn: AsyncConnection) -> bool:
+    """
+    A database without any application table is created from the current models in one
+    create_all pass and recorded at the latest version. False when the database is not new.
+    """
+    tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    if any(table in tables for table in Base.metadata.tables):
+        return False
+    await conn.run_sync(Base.metadata.create_all)
+    await install_search_index(conn)
+    await conn.execute(schema_migrations.insert(), [{"version": number, "name": name} for number, name, _ in MIGRATIONS])
+    return True
+
+async def current_version(conn: AsyncConnection) -> int:
+    await conn.run_sync(lambda sync_conn: schema_migrations.create(sync_conn, checkfirst=True))
+    result = await conn.execute(select(func.max(schema_migrations.c.version)))
+    return result.scalar() or 0
+
+async def upgrade_schema(conn: AsyncConnection) -> int:
+    """Apply pending migrations in order. Returns the schema version."""
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text(f"SELECT pg_advisory_xact_lock({_ADVISORY_LOCK_ID})"))
+
+    version = await current_version(conn)
+    if version == 0 and await bootstrap(conn):
+        print("Created a new database schema")
+        return MIGRATIONS[-1][0]
+    for number, name, step in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying schema migration {number}: {name}")
+        await step(conn)
+        await conn.execute(schema_migrations.insert().values(version=number, name=name))
+        version = number
+    return version
+
+async def migrate(engine: AsyncEngine) -> int:
+    """Run upgrade_schema in its own transaction."""
+    try:
+        async with engine.begin() as conn:
+            return await upgrade_schema(conn)
+    except IntegrityError:
+        # Another worker recorded the same migration first; its changes are committed
+        async with engine.connect() as conn:
+            return await current_version(conn)
+
+if __name__ == "__main__":
+    from app.core.database import engine
+
+    async def main():
+        version = await migrate(engine)
+        await engine.dispose()
+        print(f"Schema is at version {version}")
+
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+import base64
+import html
+import json
+import re
+from sqlalchemy import and_, column, func, literal_column, or_, select, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from app.models import ChatSession, Message
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+# The database marks matches with these private-use characters; the text is HTML-escaped
+# before they become <mark> tags, so message text can never inject markup
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+def _highlight(snippet: str | None) -> str | None:
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(_MATCH_START, SNIPPET_START).replace(_MATCH_END, SNIPPET_END)
+
+# External-content FTS5 index over messages, kept in sync by triggers
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        original_text, translated_text,
+        content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, original_text, translated_text)
+        VALUES (new.id, new.original_text, new.translated_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, original_text, translated_text)
+        VALUES ('delete', old.id, old.original_text, old.translated_text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, original_text, translated_text)
+        VALUES ('delete', old.id, old.original_text, old.translated_text);
+        INSERT INTO messages_fts(rowid, original_text, translated_text)
+        VALUES (new.id, new.original_text, new.translated_text);
+    END
+    """,
+]
+
+# 'simple' config: the conversation mixes languages, so no language-specific stemming
+POSTGRES_FTS_DDL = [
+    """
+    ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple', coalesce(original_text, '') || ' ' || coalesce(translated_text, ''))
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_messages_search_vector ON messages USING GIN (search_vector)",
+]
+
+messages_fts = table("messages_fts", column("rowid"))
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+async def install_search_index(conn: AsyncConnection):
+    """Create the full-text index for the current database if it does not exist yet."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        result = await conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"))
+        exists = result.first() is not None
+        for statement in SQLITE_FTS_DDL:
+            await conn.execute(text(statement))
+        if not exists:
+            # Index messages written before the FTS table existed
+            await conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in POSTGRES_FTS_DDL:
+            await conn.execute(text(statement))
+
+def _tokens(query: str) -> list[str]:
+    return _TOKEN.findall(query)
+
+def encode_cursor(score: float, message_id: int) -> str:
+    raw = json.dumps({"s": score, "id": message_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(data["s"]), int(data["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def search_messages(
+    db: AsyncSession,
+    query: str,
+    session_id: str | None = None,
+    clinician_id: str | None = None,
+    limit: int = 20,
+    cursor: str | None = None
+) -> tuple[list[tuple[Message, float, str]], str | None]:
+    """
+    Ranked full-text search over message text.
+    Scoped to one session, or to every session of a clinician.
+    Returns (message, score, snippet) rows, best match first (lower score is better),
+    and the cursor for the next page (None on the last page).
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return [], None
+
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        # Quote every term so user input cannot use FTS5 syntax; prefix-match the last one (search-as-you-type)
+        match = " ".join(f'"{token}"' for token in tokens) + "*"
+        fts = literal_column("messages_fts")
+        inner = (
+            select(
+                messages_fts.c.rowid.label("id"),
+                func.bm25(fts).label("score"),
+                func.snippet(fts, -1, _MATCH_START, _MATCH_END, "…", 12).label("snippet")
+            )
+            .where(fts.op("MATCH")(match))
+            .subquery()
+        )
+    elif dialect == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(tokens[:-1] + [tokens[-1] + ":*"]))
+        search_vector = literal_column("messages.search_vector")
+        inner = (
+            select(
+                Message.id.label("id"),
+                (-func.ts_rank(search_vector, tsquery)).label("score"),
+                func.ts_headline(
+                    "simple",
+                    func.coalesce(Message.original_text, "") + " " + func.coalesce(Message.translated_text, ""),
+                    tsquery,
+                    f"StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=24, MinWords=8"
+                ).label("snippet")
+            )
+            .where(search_vector.op("@@")(tsquery))
+            .subquery()
+        )
+    else:
+        # No full-text support: unranked substring match
+        pattern = f"%{query}%"
+        inner = (
+            select(Message.id.label("id"), literal_column("0.0").label("score"), Message.original_text.label("snippet"))
+            .where(or_(Message.original_text.ilike(pattern), Message.translated_text.ilike(pattern)))
+            .subquery()
+        )
+
+    stmt = select(Message, inner.c.score, inner.c.snippet).join(inner, inner.c.id == Message.id)
+    if session_id is not None:
+        stmt = stmt.where(Message.session_id == session_id)
+    if clinician_id is not None:
+        stmt = stmt.where(Message.session_id.in_(
+            select(ChatSession.id).where(ChatSession.clinician_id == clinician_id)
+        ))
+    if cursor:
+        after_score, after_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            inner.c.score > after_score,
+            and_(inner.c.score == after_score, Message.id > after_id)
+        ))
+    stmt = stmt.order_by(inner.c.score, Message.id).limit(limit + 1)
+
+    result = await db.execute(stmt)
+    rows = [(message, float(score), _highlight(snippet)) for message, score, snippet in result.all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_message, last_score, _ = rows[-1]
+        next_cursor = encode_cursor(last_score, last_message.id)
+    return rows, next_cursor
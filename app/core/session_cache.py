@@ -0,0 +1,62 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from app.core.backplane import Backplane, backplane
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.models import ChatSession
+
+settings = get_settings()
+
+INVALIDATE_CHANNEL = "invalidate:sessions"
+
+@dataclass(frozen=True)
+class SessionSnapshot:
+    """Read-only copy of a ChatSession row, safe to share between requests."""
+    id: str
+    created_at: datetime
+    doctor_lang: str
+    patient_lang: str
+    clinician_id: str | None = None
+
+class SessionCache:
+    """
+    TTL/LRU cache of session snapshots for the X-Session-ID dependency.
+    Invalidations are published on the backplane so every worker drops its copy.
+    """
+    def __init__(self, backplane: Backplane, max_size: int, ttl_seconds: float):
+        self.backplane = backplane
+        self._entries = TTLCache(max_size, ttl_seconds)
+        backplane.subscribe(INVALIDATE_CHANNEL, self._on_invalidate)
+
+    def get(self, session_id: str) -> SessionSnapshot | None:
+        return self._entries.get(session_id)
+
+    def put(self, session: ChatSession) -> SessionSnapshot:
+        snapshot = SessionSnapshot(
+            id=session.id,
+            created_at=session.created_at,
+            doctor_lang=session.doctor_lang,
+            patient_lang=session.patient_lang,
+            clinician_id=session.clinician_id
+        )
+        self._entries.set(session.id, snapshot)
+        return snapshot
+
+    async def invalidate(self, *session_ids: str):
+        """Drop sessions here and on every other worker. Call after the change is committed."""
+        if not session_ids:
+            return
+        for session_id in session_ids:
+            self._entries.pop(session_id)
+        await self.backplane.publish(INVALIDATE_CHANNEL, json.dumps(list(session_ids)))
+
+    async def _on_invalidate(self, channel: str, payload: str):
+        for session_id in json.loads(payload):
+            self._entries.pop(session_id)
+
+session_cache = SessionCache(
+    backplane,
+    max_size=settings.SESSION_CACHE_SIZE,
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import importlib.util
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Vite puts a content hash in every asset file name, so a URL's bytes never change
+IMMUTABLE = "public, max-age=31536000, immutable"
+# index.html keeps its URL across deploys; browsers revalidate it (a cheap 304)
+REVALIDATE = "no-cache"
+
+# Only text-like assets are worth compressing; images and fonts are already compressed
+_COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml|wasm|manifest\+json)|image/svg\+xml)")
+_MIN_COMPRESS_BYTES = 256
+# Preferred first
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+def brotli_available() -> bool:
+    """Brotli variants need the optional 'brotli' package; gzip is always available."""
+    return importlib.util.find_spec("brotli") is not None
+
+@dataclass
+class Asset:
+    """A file held in memory, with its precompressed variants."""
+    media_type: str
+    etag: str # Hash of the uncompressed bytes
+    variants: dict[str, bytes] = field(default_factory=dict) # Content-Encoding -> body ("identity" is the file itself)
+
+def load_asset(path: str) -> Asset:
+    """
+    Read a file and its compressed variants: a .br/.gz file next to it (from the build) is
+    used as is, otherwise gzip and brotli are produced here. Variants that are not smaller are dropped.
+    """
+    with open(path, "rb") as asset_file:
+        data = asset_file.read()
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    variants = {"identity": data}
+
+    for encoding, suffix in _ENCODINGS:
+        if os.path.exists(path + suffix):
+            with open(path + suffix, "rb") as compressed:
+                variants[encoding] = compressed.read()
+
+    if _COMPRESSIBLE.match(media_type) and len(data) >= _MIN_COMPRESS_BYTES:
+        if "gzip" not in variants:
+            variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if "br" not in variants and brotli_available():
+            import brotli
+            variants["br"] = brotli.compress(data, quality=11)
+
+    variants = {encoding: body for encoding, body in variants.items() if encoding == "identity" or len(body) < len(data)}
+    return Asset(media_type, hashlib.sha256(data).hexdigest()[:20], variants)
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def _not_modified(etag: str, request_headers: Headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+def asset_response(asset: Asset, request_headers: Headers, cache_control: str, head: bool = False) -> Response:
+    """
+    The best variant the client accepts, with a strong ETag per encoding,
+    or 304 when the client already has it.
+    """
+    accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+    encoding = next((name for name, _ in _ENCODINGS if name in accepted and name in asset.variants), "identity")
+    body = asset.variants[encoding]
+
+    headers = {
+        "ETag": f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"',
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(headers["ETag"], request_headers):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    headers["Content-Length"] = str(len(body))
+    return Response(b"" if head else body, media_type=asset.media_type, headers=headers)
+
+class PrecompressedAssets(StaticFiles):
+    """
+    Build assets loaded into memory once at startup and served from there, compressed
+    and with immutable caching. Files added after startup are not served (they come with a deploy).
+    """
+    def __init__(self, directory: str):
+        super().__init__(directory=directory)
+        self.assets: dict[str, Asset] = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith((".br", ".gz")) and os.path.exists(os.path.join(root, name[:-3])):
+                    continue # A variant of another file
+                full_path = os.path.join(root, name)
+                self.assets[os.path.normpath(os.path.relpath(full_path, directory))] = load_asset(full_path)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405, headers={"Allow": "GET, HEAD"})
+        asset = self.assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404)
+        return asset_response(asset, Headers(scope=scope), IMMUTABLE, head=scope["method"] == "HEAD")
+
+class UploadFiles(StaticFiles):
+    """
+    Stored audio: FileResponse already handles Range and If-Range for seeking, and this
+    adds long-lived caching. Content-addressed files use their SHA-256 name as the ETag,
+    so the validator survives the mtime refresh a duplicate upload causes.
+    """
+    def __init__(self, directory: str, max_age_seconds: int):
+        super().__init__(directory=directory)
+        # Private: medical audio must not be kept by shared caches
+        self.cache_control = f"private, max-age={int(max_age_seconds)}, immutable"
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if path.endswith(".part"):
+            raise HTTPException(status_code=404) # Upload still being written
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers={"Cache-Control": self.cache_control})
+        digest = os.path.splitext(os.path.basename(full_path))[0]
+        if _DIGEST.fullmatch(digest):
+            response.headers["etag"] = f'"{digest}"'
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
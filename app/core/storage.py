@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+UPLOAD_DIR = "uploads"
+CHUNK_SIZE = 256 * 1024
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Extensions Whisper accepts; anything else is derived from the content type
+AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".oga", ".ogg", ".wav", ".webm"}
+CONTENT_TYPE_EXTENSIONS = {
+    "audio/webm": ".webm",
+    "audio/ogg": ".ogg",
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/mpeg": ".mp3",
+    "audio/mp4": ".m4a",
+    "audio/flac": ".flac",
+}
+
+# Room for the multipart boundaries and the other form fields around the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadSizeLimit:
+    """
+    ASGI middleware capping request bodies on upload routes before the form parser
+    spools them to memory or disk. A Content-Length over the cap is rejected up front;
+    a body that streams past it (chunked uploads) is cut off. Both get a 413.
+    """
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefixes: tuple[str, ...]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse({"detail": f"Request body exceeds {self.max_bytes} bytes"}, status_code=413)
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer now; the app sees a disconnect and its own response is dropped
+                    rejected = True
+                    await too_large(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message):
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+@dataclass
+class StoredAudio:
+    path: str  # Filesystem path under UPLOAD_DIR
+    url: str  # Public URL under /uploads
+    sha256: str
+    size: int
+
+def audio_extension(filename: str | None, content_type: str | None) -> str:
+    """
+    Pick a safe extension for the stored file. The client filename is only trusted
+    for its extension, and only if it is a known audio type.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in AUDIO_EXTENSIONS:
+        return ext
+    mime = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(mime, ".webm")
+
+def content_path(digest: str, ext: str) -> str:
+    """Sharded, content-addressed path relative to UPLOAD_DIR: ab/cd/abcd....ext"""
+    return os.path.join(digest[:2], digest[2:4], digest + ext)
+
+def _move_into_place(tmp_path: str, final_path: str):
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if os.path.exists(final_path):
+        # Same content already stored (duplicate upload or retry); refresh its age for retention
+        os.remove(tmp_path)
+        os.utime(final_path)
+    else:
+        os.replace(tmp_path, final_path)
+
+async def save_upload(upload: UploadFile, max_bytes: int) -> StoredAudio:
+    """
+    Streams an upload to disk in chunks, hashing it on the way, without blocking the event loop.
+    Raises UploadTooLarge as soon as the file exceeds max_bytes (the request body itself
+    is capped earlier, by UploadSizeLimit).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Audio upload exceeds {max_bytes} bytes")
+                hasher.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+
+        digest = hasher.hexdigest()
+        relative_path = content_path(digest, audio_extension(upload.filename, upload.content_type))
+        final_path = os.path.join(UPLOAD_DIR, relative_path)
+        await asyncio.to_thread(_move_into_place, tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredAudio(
+        path=final_path,
+        url="/uploads/" + relative_path.replace(os.sep, "/"),
+        sha256=digest,
+        size=size
+    )
@@ -0,0 +1,38 @@
+import asyncio
+import importlib
+import time
+from app.core.config import get_settings
+from app.core.llm import get_chain
+from app.agents.audio import get_openai_client
+from app.agents.translation import translation_prompt, batch_translation_prompt
+
+settings = get_settings()
+
+# Imported lazily by the app; warm-up pays for them before the first request does
+HEAVY_MODULES = ("langchain_core.prompts", "langchain_core.output_parsers", "langchain_google_genai", "openai")
+
+# Reported by /api/health
+status = {"warmed_up": False, "seconds": None}
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+async def warm_up():
+    """Import the AI SDKs and build the default clients and chains in the background."""
+    started = time.perf_counter()
+    try:
+        # In a thread so the event loop keeps serving requests meanwhile
+        await asyncio.to_thread(_import_heavy_modules)
+        if settings.GEMINI_API_KEY:
+            for model in dict.fromkeys(route["model"] for route in settings.TRANSLATION_ROUTES):
+                get_chain(translation_prompt(), model=model)
+                get_chain(batch_translation_prompt(), model=model)
+        if settings.OPENAI_API_KEY:
+            get_openai_client()
+    except Exception as e:
+        print(f"Warm-up Error: {e}")
+        return
+    status["warmed_up"] = True
+    status["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Warm-up finished in {status['seconds']}s")
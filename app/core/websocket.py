@@ -1,24 +1,217 @@
+import asyncio
+import bisect
+import json
+import re
+from collections import OrderedDict, deque
 from fastapi import WebSocket
-from typing import List
+from app.core.config import get_settings
+from app.core.backplane import Backplane, backplane
+from app.core.messages import messages_since
+from app.core.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_RESUMES, stage
+from app.schemas import message_payload
+
+settings = get_settings()
+
+SESSION_CHANNEL = "session:"
+
+# broadcast() serializes "seq" first, so it can be read back without parsing the payload
+_SEQ = re.compile(r'^\{"seq": (\d+)')
+
+def _sequence_of(payload: str) -> int | None:
+    match = _SEQ.match(payload)
+    return int(match.group(1)) if match else None
+
+class ReplayBuffer:
+    """
+    The most recent sequenced events of each session, so a client reconnecting after a
+    network blip receives only what it missed. Bounded twice: events per session and
+    sessions, the least recently active session being dropped first.
+    """
+    def __init__(self, size: int, max_sessions: int):
+        self.size = size
+        self.max_sessions = max_sessions
+        # session_id -> (seq, payload) in seq order
+        self._events: OrderedDict[str, deque[tuple[int, str]]] = OrderedDict()
+
+    def add(self, session_id: str, seq: int, payload: str):
+        events = self._events.get(session_id)
+        if events is None:
+            events = self._events[session_id] = deque(maxlen=self.size)
+            if len(self._events) > self.max_sessions:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(session_id)
+
+        if not events or seq > events[-1][0]:
+            events.append((seq, payload))
+            return
+        # Published at the same time on two workers and delivered out of order
+        if len(events) == events.maxlen:
+            events.popleft()
+        events.insert(bisect.bisect(events, seq, key=lambda event: event[0]), (seq, payload))
+
+    def since(self, session_id: str, last_seq: int) -> list[tuple[int, str]] | None:
+        """Events after last_seq, or None when the buffer does not reach back that far."""
+        events = self._events.get(session_id)
+        if not events or events[0][0] > last_seq + 1 or last_seq > events[-1][0]:
+            return None
+        return [event for event in events if event[0] > last_seq]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._events),
+            "events": sum(len(events) for events in self._events.values())
+        }
+
+class Subscriber:
+    """
+    One connected socket with its own bounded send queue and writer task.
+    A slow socket only fills its own queue instead of stalling the broadcaster.
+    """
+    def __init__(self, websocket: WebSocket, session_id: str, queue_size: int):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.queue: asyncio.Queue[tuple[int | None, str]] = asyncio.Queue(maxsize=queue_size)
+        self.writer: asyncio.Task | None = None
+        # Sequenced events up to here were already sent while catching up
+        self.caught_up_to = 0
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Tracks the sockets connected to this worker, grouped by session.
+    Broadcasts go through the backplane so sockets on other workers receive them too.
+    Every worker keeps the replay buffer of every session, so a client can resume on any of them.
+    """
+    def __init__(self, backplane: Backplane, queue_size: int = 64, replay_size: int = 128, replay_sessions: int = 1000):
+        self.backplane = backplane
+        self.queue_size = queue_size
+        self.replay = ReplayBuffer(replay_size, replay_sessions)
+        # session_id -> {websocket: subscriber}
+        self.rooms: dict[str, dict[WebSocket, Subscriber]] = {}
+        # Closes of evicted sockets still running; the loop only keeps weak references to tasks
+        self._closing: set[asyncio.Task] = set()
+        backplane.subscribe(SESSION_CHANNEL, self._deliver)
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, session_id: str, last_seq: int | None = None, last_message_id: int | None = None):
+        """
+        Accept the socket and send a "sync" event with the session's current seq.
+        With last_seq (the newest seq the client saw) the events it missed are sent first:
+        from the replay buffer, or as the messages after last_message_id when the buffer
+        has rolled over.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        subscriber = Subscriber(websocket, session_id, self.queue_size)
+        # Registered before catching up, so nothing published meanwhile is lost;
+        # the writer skips queued events the catch-up already sent
+        self.rooms.setdefault(session_id, {})[websocket] = subscriber
+        try:
+            with stage("ws_sync"):
+                await self._sync(subscriber, last_seq, last_message_id)
+        except Exception:
+            self.disconnect(websocket, session_id)
+            raise
+        subscriber.writer = asyncio.create_task(self._write(subscriber))
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    def disconnect(self, websocket: WebSocket, session_id: str):
+        room = self.rooms.get(session_id)
+        if room is None:
+            return
+        subscriber = room.pop(websocket, None)
+        if not room:
+            del self.rooms[session_id]
+        if subscriber and subscriber.writer and subscriber.writer is not asyncio.current_task():
+            subscriber.writer.cancel()
 
-    async def broadcast(self, message: dict):
-        """Send message to all connected clients"""
-        for connection in self.active_connections:
+    async def broadcast(self, session_id: str, message: dict, replay: bool = True):
+        """
+        Send message to every client subscribed to the session, on any worker.
+        Replayable events get the session's next "seq"; pass replay=False for transient
+        ones (stream deltas, progress) that a reconnecting client has no use for.
+        """
+        with stage("ws_broadcast"):
+            if replay:
+                message = {"seq": await self.backplane.next_sequence(session_id), **message}
+            # Serialize once; every subscriber gets the same payload
+            payload = json.dumps(message)
+            await self.backplane.publish(SESSION_CHANNEL + session_id, payload)
+
+    async def _deliver(self, channel: str, payload: str):
+        session_id = channel[len(SESSION_CHANNEL):]
+        seq = _sequence_of(payload)
+        if seq is not None:
+            # Kept even without local sockets: their clients may reconnect here
+            self.replay.add(session_id, seq, payload)
+
+        room = self.rooms.get(session_id)
+        if not room:
+            return
+
+        for subscriber in list(room.values()):
             try:
-                await connection.send_json(message)
-            except:
-                # Connection closed, will be removed on next disconnect
-                pass
+                subscriber.queue.put_nowait((seq, payload))
+            except asyncio.QueueFull:
+                print(f"WebSocket Evicted: slow consumer in session {session_id}")
+                self._evict(subscriber)
+
+    async def _sync(self, subscriber: Subscriber, last_seq: int | None, last_message_id: int | None):
+        session_id = subscriber.session_id
+        websocket = subscriber.websocket
+        sync = {"type": "sync", "session_id": session_id}
+
+        missed = self.replay.since(session_id, last_seq) if last_seq is not None else None
+        if missed is not None:
+            for seq, payload in missed:
+                await websocket.send_text(payload)
+            current = missed[-1][0] if missed else last_seq
+            WEBSOCKET_RESUMES.inc(source="replay" if missed else "current")
+        else:
+            # Read before the messages: anything sequenced later is still in the queue
+            current = await self.backplane.current_sequence(session_id)
+            if last_seq is not None and last_seq == current:
+                WEBSOCKET_RESUMES.inc(source="current")
+            elif last_seq is not None:
+                # Rolled out of the buffer (or this worker started after the client left)
+                messages = await messages_since(session_id, last_message_id) if last_message_id is not None else None
+                # None: the client's history no longer matches and it reloads it
+                sync["messages"] = [message_payload(message) for message in messages] if messages is not None else None
+                WEBSOCKET_RESUMES.inc(source="database")
+
+        subscriber.caught_up_to = current
+        await websocket.send_text(json.dumps({**sync, "seq": current}))
+
+    def connection_count(self) -> int:
+        return sum(len(room) for room in self.rooms.values())
+
+    def _evict(self, subscriber: Subscriber):
+        self.disconnect(subscriber.websocket, subscriber.session_id)
+        # 1013 = Try Again Later; the client reconnects and resumes from its last seq
+        task = asyncio.create_task(self._close(subscriber.websocket, code=1013))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _write(self, subscriber: Subscriber):
+        try:
+            while True:
+                seq, payload = await subscriber.queue.get()
+                if seq is not None and seq <= subscriber.caught_up_to:
+                    continue
+                await subscriber.websocket.send_text(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection closed underneath us
+            self.disconnect(subscriber.websocket, subscriber.session_id)
+
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
 
-manager = ConnectionManager()
+manager = ConnectionManager(
+    backplane,
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    replay_size=settings.WS_REPLAY_BUFFER_SIZE,
+    replay_sessions=settings.WS_REPLAY_SESSIONS
+)
+WEBSOCKET_CONNECTIONS.add(lambda: {(): manager.connection_count()})
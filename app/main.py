@@ -1,61 +1,117 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import os
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core.config import get_settings
 from app.api.endpoints import router as api_router
-from app.core.database import engine, Base
+from app.core.database import engine
+from app.core.schema import migrate
+from app.core.clients import close_all_clients
+from app.core.backplane import backplane
+from app.api.audio_jobs import audio_job_queue, sweep_audio_jobs
+from app.core.retention import retention_service
+from app.core.metrics import make_metrics_middleware, registry
+from app.core.warmup import warm_up
+from app.core.static import PrecompressedAssets, UploadFiles, REVALIDATE, asset_response, load_asset
+from app.core.storage import FORM_OVERHEAD_BYTES, UPLOAD_DIR, UploadSizeLimit
 
 settings = get_settings()
 
+UI_DIST = "ui/dist"
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Startup: apply pending schema migrations (a single version check when up to date)
+    if settings.MIGRATE_ON_STARTUP:
+        app.state.schema_version = await migrate(engine)
+    await backplane.start()
+    await audio_job_queue.start()
+    # In the background: a large backlog must not hold up startup
+    recovery_task = asyncio.create_task(sweep_audio_jobs())
+    if settings.RETENTION_ENABLED:
+        await retention_service.start()
+    # The AI SDKs are otherwise imported by the first request that needs them
+    warm_up_task = asyncio.create_task(warm_up()) if settings.WARMUP_ON_STARTUP else None
     yield
     # Shutdown
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    recovery_task.cancel()
+    await retention_service.stop()
+    await audio_job_queue.stop()
+    await backplane.stop()
+    await close_all_clients()
     await engine.dispose()
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json",
-    lifespan=lifespan
-)
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Mount Uploads (for Audio playback)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+def create_app() -> FastAPI:
+    """
+    Build the application. Cheap to call: AI SDKs are imported on first use (or by the
+    warm-up hook) and the database is only touched when the lifespan starts.
+    """
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.VERSION,
+        openapi_url=f"{settings.API_V1_STR}/openapi.json",
+        lifespan=lifespan
+    )
 
-import os
-from fastapi.responses import FileResponse
-
-# ... existing code ...
-
-# Include API Router
-app.include_router(api_router, prefix="/api")
-
-# Serve React App (SPA)
-# Mount static assets (JS/CSS/Images)
-if os.path.exists("ui/dist"):
-    app.mount("/assets", StaticFiles(directory="ui/dist/assets"), name="assets")
-
-@app.get("/{full_path:path}")
-async def catch_all(full_path: str):
-    # Allow API calls to pass through (handled by include_router above, but just in case)
-    if full_path.startswith("api") or full_path.startswith("uploads"):
-        return {"error": "Not Found"}
-    
-    # Serve index.html for any other route (Client-side routing)
-    if os.path.exists("ui/dist/index.html"):
-        return FileResponse("ui/dist/index.html")
-    return {"message": "UI not built. Run 'npm run build' in /ui"}
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Audio uploads are capped while they stream in, not after the form has been spooled
+    app.add_middleware(
+        UploadSizeLimit,
+        max_bytes=settings.AUDIO_MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+        path_prefixes=("/api/audio",)
+    )
+
+    # Request metrics and optional trace headers
+    if settings.METRICS_ENABLED:
+        app.middleware("http")(make_metrics_middleware(settings.TRACE_HEADERS_ENABLED))
+
+    # Mount Uploads (for Audio playback): Range requests for seeking, cached by the browser
+    upload_max_age = settings.UPLOAD_CACHE_MAX_AGE_SECONDS
+    if settings.UPLOAD_TTL_DAYS:
+        # Do not let browsers keep audio past the retention period
+        upload_max_age = min(upload_max_age, int(settings.UPLOAD_TTL_DAYS * 24 * 3600))
+    app.mount("/uploads", UploadFiles(directory=UPLOAD_DIR, max_age_seconds=upload_max_age), name="uploads")
+
+    # Include API Router
+    app.include_router(api_router, prefix="/api")
+
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        async def metrics():
+            return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+    # Serve React App (SPA)
+    # Mount static assets (JS/CSS/Images): read once, served from memory, precompressed
+    if os.path.exists(f"{UI_DIST}/assets"):
+        app.mount("/assets", PrecompressedAssets(directory=f"{UI_DIST}/assets"), name="assets")
+
+    # Loaded once; a new build ships with a restart
+    index_path = f"{UI_DIST}/index.html"
+    index = load_asset(index_path) if os.path.exists(index_path) else None
+
+    @app.get("/{full_path:path}")
+    async def catch_all(full_path: str, request: Request):
+        # Allow API calls to pass through (handled by include_router above, but just in case)
+        if full_path.startswith("api") or full_path.startswith("uploads"):
+            return {"error": "Not Found"}
+
+        # Serve index.html for any other route (Client-side routing)
+        if index is not None:
+            return asset_response(index, request.headers, REVALIDATE)
+        return {"message": "UI not built. Run 'npm run build' in /ui"}
+
+    return app
+
+app = create_app()
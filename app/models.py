@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -14,6 +14,7 @@ class ChatSession(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     doctor_lang = Column(String, default="en")
     patient_lang = Column(String, default="es")
+    clinician_id = Column(String, nullable=True, index=True)  # Groups a clinician's sessions for search
     
     messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
 
@@ -29,3 +30,50 @@ class Message(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     session = relationship("ChatSession", back_populates="messages")
+
+    __table_args__ = (
+        # History reads: WHERE session_id = ? ORDER BY timestamp, id (keyset pagination)
+        Index("ix_messages_session_ts_id", "session_id", "timestamp", "id"),
+    )
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
+
+    namespace = Column(String, primary_key=True)  # e.g. 'translation'
+    key = Column(String, primary_key=True)  # Hash of the normalized lookup parts
+    value = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SummaryCheckpoint(Base):
+    __tablename__ = "summary_checkpoints"
+
+    session_id = Column(String, ForeignKey("sessions.id"), primary_key=True)
+    summary = Column(Text)
+    last_message_id = Column(Integer)  # Newest message folded into the summary
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AudioJob(Base):
+    __tablename__ = "audio_jobs"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    session_id = Column(String, ForeignKey("sessions.id"))
+    role = Column(String)
+    status = Column(String, default="queued")  # queued, running, transcribed, translated, completed, failed
+    audio_path = Column(String)  # Stored file under uploads/
+    audio_url = Column(String)
+    audio_hash = Column(String)
+    transcription = Column(Text, nullable=True)
+    translation = Column(Text, nullable=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    claimed_by = Column(String, nullable=True)  # Worker running the job
+    lease_expires_at = Column(DateTime, nullable=True)  # Renewed while running; an expired lease can be taken over
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ExportWatermark(Base):
+    __tablename__ = "export_watermarks"
+
+    consumer = Column(String, primary_key=True)  # e.g. 'ehr-nightly'
+    last_message_id = Column(Integer, default=0)  # Newest message in the consumer's last completed export
+    exported_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
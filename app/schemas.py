@@ -5,17 +5,22 @@ from datetime import datetime
 class SessionCreate(BaseModel):
     doctor_lang: str = "en"
     patient_lang: str = "es"
+    clinician_id: Optional[str] = None
 
 class SessionResponse(BaseModel):
     id: str
     created_at: datetime
     doctor_lang: str
     patient_lang: str
+    clinician_id: Optional[str] = None
 
 class MessageCreate(BaseModel):
     role: str # 'doctor' or 'patient'
     content: str
 
+class MessageBatch(BaseModel):
+    messages: List[MessageCreate] # e.g. discharge instructions, one segment per message
+
 class MessageResponse(BaseModel):
     id: int
     session_id: str
@@ -28,8 +33,45 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SearchHit(MessageResponse):
+    snippet: Optional[str] = None # Matching fragment as HTML: escaped text with <mark> highlights
+    score: float # Lower is a better match
+
+class SearchResponse(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None # Pass as ?cursor= to fetch the next page
+
 class SummaryRequest(BaseModel):
     pass # Session ID inferred from header
 
 class SummaryResponse(BaseModel):
     summary: str
+    cached: bool = False # True when no new messages arrived since the last summary
+
+class AudioJobResponse(BaseModel):
+    id: str
+    session_id: str
+    role: str
+    status: str # queued, running, transcribed, translated, completed, failed
+    audio_url: Optional[str] = None
+    transcription: Optional[str] = None
+    translation: Optional[str] = None
+    message_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+def message_payload(message) -> dict:
+    """JSON-ready form of a message, as pushed to WebSocket clients."""
+    return {
+        "id": message.id,
+        "session_id": message.session_id,
+        "role": message.role,
+        "original_text": message.original_text,
+        "translated_text": message.translated_text,
+        "audio_url": message.audio_url,
+        "timestamp": message.timestamp.isoformat()
+    }
@@ -0,0 +1,113 @@
+"""
+Deterministic local stand-ins for Gemini and Whisper, so load tests burn no quota.
+Latency and error rates are configurable; outputs depend only on the input.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import Any, AsyncIterator
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TARGET_LANG = re.compile(r"into (\S+?)\.")
+
+class FakeUpstreamError(Exception):
+    """Looks like an SDK error to the upstream governor (it carries an HTTP status)."""
+    def __init__(self, status_code: int):
+        super().__init__(f"Fake upstream error {status_code}")
+        self.status_code = status_code
+
+class FakeBackend:
+    """Shared latency/error model. One seeded RNG makes runs reproducible."""
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, seed: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def wait(self, scale: float = 1.0):
+        """Sleep for one simulated upstream call, or fail like a degraded provider would."""
+        self.calls += 1
+        delay_ms = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) * scale
+        await asyncio.sleep(delay_ms / 1000)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            # Mostly server errors, some rate limits, as seen from real providers
+            raise FakeUpstreamError(429 if self.rng.random() < 0.3 else 503)
+
+def fake_reply(messages: list[BaseMessage]) -> str:
+    """What the fake model answers, derived from the prompt the app sent."""
+    system = next((str(m.content) for m in messages if m.type == "system"), "")
+    user = str(messages[-1].content) if messages else ""
+    match = _TARGET_LANG.search(system)
+    lang = match.group(1) if match else "xx"
+
+    if "JSON array" in system:
+        return json.dumps([f"[{lang}] {segment}" for segment in json.loads(user)], ensure_ascii=False)
+    if "Translate" in system:
+        return f"[{lang}] {user}"
+    lines = user.count("\n") + 1
+    return (
+        f"**Symptoms**: Reported over {lines} lines of conversation.\n"
+        "**Diagnoses**: Not confirmed.\n"
+        "**Medications**: None mentioned.\n"
+        "**Next Steps**: Follow up as instructed."
+    )
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with fake latency; streams its reply in small chunks."""
+    backend: Any
+    chunk_chars: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=fake_reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self.backend.wait()
+        return self._generate(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        # Time to first token is a fraction of a full call; the rest is spread over the chunks
+        await self.backend.wait(scale=0.3)
+        reply = fake_reply(messages)
+        pieces = [reply[i:i + self.chunk_chars] for i in range(0, len(reply), self.chunk_chars)]
+        for piece in pieces:
+            await asyncio.sleep(self.backend.latency_ms * 0.7 / 1000 / max(1, len(pieces)))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+class _FakeTranscriptions:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    async def create(self, model: str, file, response_format: str = "text", **kwargs) -> str:
+        _, data = file
+        # Whisper time grows with audio length (~1s of 16 kHz mono PCM per 32 KB)
+        await self.backend.wait(scale=1 + len(data) / 32000 / 10)
+        return f"Fake transcription {hashlib.sha256(data).hexdigest()[:8]} of {len(data)} bytes"
+
+class FakeOpenAIClient:
+    def __init__(self, backend: FakeBackend):
+        self.audio = type("Audio", (), {"transcriptions": _FakeTranscriptions(backend)})()
+
+    async def close(self):
+        pass
+
+def install(latency_ms: float = 150, jitter_ms: float = 50, error_rate: float = 0.0, seed: int = 0) -> FakeBackend:
+    """Swap get_llm and get_openai_client for the fakes in this process."""
+    import app.agents.audio as audio
+    import app.core.llm as llm
+
+    backend = FakeBackend(latency_ms, jitter_ms, error_rate, seed)
+    fake_llm = FakeChatModel(backend=backend)
+    fake_client = FakeOpenAIClient(backend)
+
+    llm.get_llm = lambda api_key=None, model=None, temperature=0.1: fake_llm
+    audio.get_openai_client = lambda api_key=None: fake_client
+    return backend
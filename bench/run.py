@@ -0,0 +1,343 @@
+"""
+Load test and benchmark for the API, against fake AI backends.
+
+Starts the app (python -m bench.server) in a scratch directory with its own SQLite
+database, drives /api/chat, /api/audio, /api/summary and /api/search while WebSocket
+subscribers listen on the session, and writes latency percentiles, throughput and
+server memory to JSON. Pass --compare with an earlier result to see regressions.
+
+    python -m bench.run --requests 200 --concurrency 16 --ws-subscribers 50
+    python -m bench.run --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime, timezone
+import httpx
+import websockets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Short clinical turns; search queries are drawn from the same words
+PHRASES = [
+    "Where does it hurt the most",
+    "I have had a headache for three days",
+    "Are you allergic to penicillin",
+    "The pain gets worse when I breathe deeply",
+    "Take two tablets of ibuprofen every eight hours",
+    "Do you have a fever or chills",
+    "My chest feels tight at night",
+    "We will run a blood test today",
+]
+SEARCH_TERMS = ["headache", "pain", "penicillin", "fever", "blood", "tablets", "chest", "hurt"]
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+def summarize(latencies_ms: list[float], errors: int, duration: float) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+        "max_ms": round(values[-1], 2) if values else 0.0,
+        "throughput_rps": round(len(values) / duration, 2) if duration else 0.0,
+        "duration_s": round(duration, 3),
+    }
+
+def make_wav(index: int, seconds: float = 1.0, rate: int = 16000) -> bytes:
+    """A short tone; the pitch varies per request so uploads are never cache hits."""
+    frequency = 220 + index % 400
+    frames = bytearray()
+    for n in range(int(seconds * rate)):
+        sample = int(8000 * math.sin(2 * math.pi * frequency * n / rate))
+        frames += sample.to_bytes(2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+def read_memory_mb(pid: int | None) -> dict | None:
+    """Current and peak resident memory of the server process (Linux only)."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status if ":" in line)
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+        "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_server(args, workdir: str) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+        "GEMINI_API_KEY": "bench",
+        "OPENAI_API_KEY": "bench",
+        "RETENTION_ENABLED": "false",
+        # Measure the app, not our own quota pacing; override in the environment to include it
+        "GEMINI_RATE_PER_MINUTE": os.environ.get("GEMINI_RATE_PER_MINUTE", "0"),
+        "OPENAI_RATE_PER_MINUTE": os.environ.get("OPENAI_RATE_PER_MINUTE", "0"),
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "bench.server",
+            "--port", str(port),
+            "--latency-ms", str(args.latency_ms),
+            "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate),
+            "--seed", str(args.seed),
+        ],
+        cwd=workdir, # uploads/ and the database stay in the scratch directory
+        env=env
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/api/session/demo")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+async def run_scenario(name: str, send, total: int, concurrency: int) -> dict:
+    """Issue `total` requests from `concurrency` workers; send(i) returns an httpx response."""
+    latencies, errors = [], 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await send(index)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - start)
+    print(f"{name:>8}: {result['requests']} req, p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+          f"p99 {result['p99_ms']} ms, {result['throughput_rps']} req/s, {result['errors']} errors")
+    return result
+
+class Subscribers:
+    """WebSocket clients on one session, measuring how long new_message events take to arrive."""
+    def __init__(self, ws_url: str, count: int):
+        self.ws_url = ws_url
+        self.count = count
+        self.sent_at: dict[str, float] = {} # message tag -> when its POST started
+        self.delivery_ms: list[float] = []
+        self.received = 0
+        self.connect_failures = 0
+        self._tasks: list[asyncio.Task] = []
+        self._connected = 0
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._listen()) for _ in range(self.count)]
+        deadline = time.monotonic() + 30
+        while self._connected + self.connect_failures < self.count and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def stop(self) -> dict:
+        await asyncio.sleep(0.5) # Let the last broadcasts land
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        values = sorted(self.delivery_ms)
+        return {
+            "subscribers": self.count,
+            "connect_failures": self.connect_failures,
+            "events_received": self.received,
+            "delivery_p50_ms": round(percentile(values, 50), 2),
+            "delivery_p95_ms": round(percentile(values, 95), 2),
+            "delivery_p99_ms": round(percentile(values, 99), 2),
+        }
+
+    async def _listen(self):
+        try:
+            async with websockets.connect(self.ws_url, max_queue=None) as ws:
+                self._connected += 1
+                async for raw in ws:
+                    event = json.loads(raw)
+                    if event.get("type") != "new_message":
+                        continue
+                    self.received += 1
+                    tag = event["message"]["original_text"].rsplit("#", 1)[-1]
+                    if tag in self.sent_at:
+                        self.delivery_ms.append((time.perf_counter() - self.sent_at[tag]) * 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"WebSocket Error: {e}")
+            self.connect_failures += 1
+
+async def benchmark(args, base_url: str, pid: int | None) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_ready(client)
+        session = (await client.post("/api/session", json={
+            "doctor_lang": "en", "patient_lang": "es", "clinician_id": "bench"
+        })).json()
+        headers = {"X-Session-ID": session["id"]}
+        memory_start = read_memory_mb(pid)
+
+        subscribers = None
+        if args.ws_subscribers:
+            ws_url = base_url.replace("http", "ws", 1) + f"/api/ws?session_id={session['id']}"
+            subscribers = Subscribers(ws_url, args.ws_subscribers)
+            await subscribers.start()
+
+        async def chat(i: int):
+            tag = f"chat{i}"
+            if subscribers:
+                subscribers.sent_at[tag] = time.perf_counter()
+            return await client.post("/api/chat", headers=headers, json={
+                "role": "doctor" if i % 2 == 0 else "patient",
+                "content": f"{PHRASES[i % len(PHRASES)]} #{tag}",
+            })
+
+        async def audio(i: int):
+            tag = f"audio{i}"
+            return await client.post(
+                "/api/audio",
+                headers=headers,
+                data={"role": "patient"},
+                files={"file": (f"{tag}.wav", make_wav(i), "audio/wav")}
+            )
+
+        async def summary(i: int):
+            return await client.post("/api/summary", headers=headers, json={})
+
+        async def search(i: int):
+            return await client.get("/api/search", headers=headers, params={"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]})
+
+        scenarios = {"chat": chat, "audio": audio, "summary": summary, "search": search}
+        results = {}
+        for name in args.scenarios:
+            results[name] = await run_scenario(name, scenarios[name], args.requests, args.concurrency)
+
+        websocket = await subscribers.stop() if subscribers else None
+        if websocket:
+            print(f"      ws: {websocket['subscribers']} subscribers, {websocket['events_received']} events, "
+                  f"delivery p95 {websocket['delivery_p95_ms']} ms")
+
+    return {
+        "scenarios": results,
+        "websocket": websocket,
+        "memory": {"start": memory_start, "end": read_memory_mb(pid)},
+    }
+
+def compare(current: dict, baseline: dict):
+    print(f"\nCompared with {baseline['meta'].get('git_commit') or 'baseline'} ({baseline['meta']['timestamp']}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if before[key]:
+                changes.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"{name:>8}: " + ", ".join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default="chat,audio,summary,search", type=lambda value: value.split(","))
+    parser.add_argument("--ws-subscribers", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Mean fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake upstream calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="Benchmark an already running server (fakes must be installed there)")
+    parser.add_argument("--output", help="Result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - {"chat", "audio", "summary", "search"}
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    timestamp = datetime.now(timezone.utc)
+    with tempfile.TemporaryDirectory(prefix="nao-bench-") as workdir:
+        process = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            process, base_url = start_server(args, workdir)
+        try:
+            report = asyncio.run(benchmark(args, base_url, process.pid if process else None))
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=30)
+
+    report["meta"] = {
+        "timestamp": timestamp.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+
+    output = args.output or os.path.join(REPO_ROOT, "bench", "results", timestamp.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Startup-time benchmark: how long `import app.main` takes, and how long a fresh
+process takes until /api/health answers (cold boot with a new database, then a
+restart on the migrated one). Each boot runs the plain app under uvicorn, so no
+fake backends are imported.
+
+    python -m bench.startup --runs 5
+    python -m bench.startup --warm-up --compare bench/results/startup-<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import httpx
+from bench.run import REPO_ROOT, free_port, git_commit
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "import sys; print(time.perf_counter() - start); "
+    "print(int('langchain_google_genai' in sys.modules or 'openai' in sys.modules))"
+)
+
+def app_env(workdir: str, warm_up: bool) -> dict:
+    return {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'startup.db')}",
+        "RETENTION_ENABLED": "false",
+        "WARMUP_ON_STARTUP": "true" if warm_up else "false",
+    }
+
+def measure_import(workdir: str, env: dict) -> tuple[float, bool]:
+    """Seconds to import app.main in a new interpreter, and whether an AI SDK came along."""
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=env, text=True)
+    seconds, sdk_loaded = output.split()[-2:]
+    return float(seconds), sdk_loaded == "1"
+
+def measure_boot(workdir: str, env: dict, timeout: float = 60) -> float:
+    """Seconds from spawning uvicorn until /api/health returns 200."""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if client.get("/api/health").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {process.returncode}")
+                time.sleep(0.01)
+        raise RuntimeError("Server did not become ready")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "runs": len(values),
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+def benchmark(args) -> dict:
+    imports, cold, restart = [], [], []
+    sdk_loaded = False
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="nao-startup-") as workdir:
+            env = app_env(workdir, args.warm_up)
+            seconds, loaded = measure_import(workdir, env)
+            imports.append(seconds)
+            sdk_loaded = sdk_loaded or loaded
+            cold.append(measure_boot(workdir, env)) # New database: migrations run
+            restart.append(measure_boot(workdir, env)) # Migrated database: version check only
+
+    results = {
+        "import": summarize(imports),
+        "ready_cold": summarize(cold),
+        "ready_restart": summarize(restart),
+    }
+    for name, result in results.items():
+        print(f"{name:>13}: median {result['median_ms']} ms (min {result['min_ms']}, max {result['max_ms']})")
+    if sdk_loaded:
+        print("Warning: importing app.main loaded an AI SDK")
+    return {"startup": results, "ai_sdk_imported_at_startup": sdk_loaded}
+
+def compare(current: dict, baseline: dict):
+    print(f"\nCompared with {baseline['meta'].get('git_commit') or 'baseline'} ({baseline['meta']['timestamp']}):")
+    for name, result in current["startup"].items():
+        before = baseline.get("startup", {}).get(name)
+        if before and before["median_ms"]:
+            change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+            print(f"{name:>13}: median {change:+.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--warm-up", action="store_true", help="Boot with WARMUP_ON_STARTUP enabled")
+    parser.add_argument("--output", help="Result file (default: bench/results/startup-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier startup result file to compare against")
+    args = parser.parse_args()
+
+    timestamp = datetime.now(timezone.utc)
+    report = benchmark(args)
+    report["meta"] = {
+        "timestamp": timestamp.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+
+    output = args.output or os.path.join(REPO_ROOT, "bench", "results", "startup-" + timestamp.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
+
+if __name__ == "__main__":
+    main()
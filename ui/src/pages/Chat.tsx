@@ -39,12 +39,21 @@ export default function Chat() {
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const sessionRef = useRef<Session | null>(null);
+    const messagesRef = useRef<MsgType[]>([]);
+    // Newest event seq received; sent on reconnect to get only the missed events
+    const lastSeqRef = useRef<number | null>(null);
+    // Audio jobs submitted from this tab, so their failures are reported here
+    const audioJobsRef = useRef<Set<string>>(new Set());
 
     // Keep sessionRef updated
     useEffect(() => {
         sessionRef.current = session;
     }, [session]);
 
+    useEffect(() => {
+        messagesRef.current = messages;
+    }, [messages]);
+
     // 1. Init Shared Demo Session
     useEffect(() => {
         const initSession = async () => {
@@ -58,8 +67,8 @@ export default function Chat() {
                 setSession(res.data);
                 setSessionId(res.data.id);
 
-                // Fetch initial messages after session is set
-                const messagesRes = await api.get('/messages');
+                // Fetch the newest messages after session is set
+                const messagesRes = await api.get('/messages', { params: { tail: 200 } });
                 setMessages(messagesRes.data);
             } catch (e) {
                 console.error("Failed to init session", e);
@@ -74,9 +83,13 @@ export default function Chat() {
         if (!session) return;
 
         try {
-            const url = searchQuery ? `/search?q=${searchQuery}` : '/messages';
-            const res = await api.get(url);
-            setMessages(res.data);
+            if (searchQuery) {
+                const res = await api.get('/search', { params: { q: searchQuery } });
+                setMessages(res.data.results);
+            } else {
+                const res = await api.get('/messages', { params: { tail: 200 } });
+                setMessages(res.data);
+            }
             setIsOnline(true);
         } catch (e) {
             console.error("Fetch error", e);
@@ -92,62 +105,128 @@ export default function Chat() {
         }
     }, [searchQuery]);
 
-    // WebSocket for real-time updates
-    // WebSocket for real-time updates
+    // WebSocket for real-time updates; reconnects and resumes after a drop
     useEffect(() => {
         if (!session) return;
 
-        // Use 'host' (includes port if present) instead of hardcoding :8000
-        // This ensures it works on localhost:8000 AND production domains (autodetect)
-        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/api/ws`;
-        const ws = new WebSocket(wsUrl);
-
-        // Heartbeat to keep connection alive (prevent 60s load balancer timeout)
-        const pingInterval = setInterval(() => {
-            if (ws.readyState === WebSocket.OPEN) {
-                ws.send("ping");
+        let ws: WebSocket;
+        let pingInterval: ReturnType<typeof setInterval>;
+        let reconnectTimer: ReturnType<typeof setTimeout>;
+        let retryDelay = 1000;
+        let stopped = false;
+        const sessionId = session.id;
+
+        const connect = () => {
+            // Use 'host' (includes port if present) instead of hardcoding :8000
+            // This ensures it works on localhost:8000 AND production domains (autodetect)
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            const params = new URLSearchParams({ session_id: sessionId });
+            if (lastSeqRef.current !== null) {
+                params.set('last_seq', String(lastSeqRef.current));
+                const lastMessage = [...messagesRef.current].reverse().find(m => m.id > 0);
+                if (lastMessage) params.set('last_message_id', String(lastMessage.id));
             }
-        }, 30000); 
+            ws = new WebSocket(`${protocol}//${window.location.host}/api/ws?${params}`);
 
-        ws.onopen = () => {
-            console.log('WebSocket connected');
-            setIsOnline(true);
-        };
+            // Heartbeat to keep connection alive (prevent 60s load balancer timeout)
+            pingInterval = setInterval(() => {
+                if (ws.readyState === WebSocket.OPEN) {
+                    ws.send("ping");
+                }
+            }, 30000);
 
-        ws.onmessage = (event) => {
-            try {
-                // Ignore empty or keep-alive messages if any
-                if (!event.data) return;
-                
-                const data = JSON.parse(event.data);
-                if (data.type === 'new_message') {
-                    // Add new message to state
-                    setMessages(prev => [...prev, {
-                        ...data.message,
-                        timestamp: new Date(data.message.timestamp) // Convert string back to Date
-                    }]);
-                } else if (data.type === 'clear_history') {
-                    if (data.session_id === sessionRef.current?.id) {
-                        setMessages([]);
+            ws.onopen = () => {
+                console.log('WebSocket connected');
+                retryDelay = 1000;
+                setIsOnline(true);
+            };
+
+            ws.onmessage = (event) => {
+                try {
+                    // Ignore empty or keep-alive messages if any
+                    if (!event.data) return;
+
+                    const data = JSON.parse(event.data);
+                    if (data.type === 'sync') {
+                        // The server's position is authoritative: after a restart or a counter
+                        // reset it can be lower than what this tab saw before
+                        lastSeqRef.current = data.seq;
+                    } else if (typeof data.seq === 'number') {
+                        lastSeqRef.current = Math.max(lastSeqRef.current ?? 0, data.seq);
+                    }
+                    if (data.type === 'sync') {
+                        // Missed events no longer in the server's replay buffer
+                        if (data.messages === null) {
+                            api.get('/messages', { params: { tail: 200 } }).then(res => setMessages(res.data));
+                        } else if (data.messages) {
+                            setMessages(prev => {
+                                const known = new Set(prev.map(m => m.id));
+                                const missed = (data.messages as MsgType[]).filter(m => !known.has(m.id));
+                                // Placeholders of streams that finished while offline are replaced by the saved messages
+                                return [...prev.filter(m => m.id > 0), ...missed];
+                            });
+                        }
+                    } else if (data.type === 'translation_start') {
+                        // Placeholder that fills in as translation deltas arrive
+                        setMessages(prev => [...prev, {
+                            id: -Date.now(),
+                            session_id: data.session_id,
+                            role: data.role,
+                            original_text: data.original_text,
+                            translated_text: '',
+                            timestamp: new Date().toISOString(),
+                            stream_id: data.stream_id
+                        }]);
+                    } else if (data.type === 'translation_delta') {
+                        setMessages(prev => prev.map(m => m.stream_id === data.stream_id
+                            ? { ...m, translated_text: (m.translated_text || '') + data.delta }
+                            : m));
+                    } else if (data.type === 'job_progress') {
+                        if (data.status === 'failed' && audioJobsRef.current.delete(data.job_id)) {
+                            alert(`Recording could not be processed: ${data.error || 'unknown error'}`);
+                        }
+                    } else if (data.type === 'new_message') {
+                        if (data.job_id) audioJobsRef.current.delete(data.job_id);
+                        const message = {
+                            ...data.message,
+                            timestamp: new Date(data.message.timestamp) // Convert string back to Date
+                        };
+                        // Streamed messages replace their placeholder; others are appended once
+                        setMessages(prev => data.stream_id && prev.some(m => m.stream_id === data.stream_id)
+                            ? prev.map(m => m.stream_id === data.stream_id ? message : m)
+                            : prev.some(m => m.id === message.id) ? prev : [...prev, message]);
+                    } else if (data.type === 'clear_history') {
+                        if (data.session_id === sessionRef.current?.id) {
+                            setMessages([]);
+                        }
                     }
+                } catch (e) {
+                    console.error("WS Message Error", e);
                 }
-            } catch (e) {
-                console.error("WS Message Error", e);
-            }
-        };
+            };
 
-        ws.onerror = () => {
-            console.error('WebSocket error');
-            setIsOnline(false);
-        };
+            ws.onerror = () => {
+                console.error('WebSocket error');
+                setIsOnline(false);
+            };
 
-        ws.onclose = () => {
-            console.log('WebSocket disconnected');
-            setIsOnline(false);
+            ws.onclose = () => {
+                console.log('WebSocket disconnected');
+                clearInterval(pingInterval);
+                setIsOnline(false);
+                if (!stopped) {
+                    // Jittered backoff so tablets on the same Wi-Fi do not reconnect in lockstep
+                    reconnectTimer = setTimeout(connect, retryDelay * (0.5 + Math.random()));
+                    retryDelay = Math.min(retryDelay * 2, 15000);
+                }
+            };
         };
 
+        connect();
+
         return () => {
+            stopped = true;
+            clearTimeout(reconnectTimer);
             clearInterval(pingInterval);
             ws.close();
         };
@@ -167,7 +246,7 @@ export default function Chat() {
         setIsSending(true);
 
         try {
-            await api.post('/chat', { role, content: tempMessage });
+            await api.post('/chat/stream', { role, content: tempMessage });
             // WebSocket will push the new message automatically
         } catch (e) {
             console.error("Send error", e);
@@ -192,9 +271,16 @@ export default function Chat() {
                 formData.append('role', role);
                 formData.append('file', blob, 'recording.webm');
 
-                await api.post('/audio', formData, {
-                    headers: { 'Content-Type': 'multipart/form-data' }
-                });
+                // Processed in the background; progress and the message arrive over the WebSocket
+                try {
+                    const res = await api.post('/audio/jobs', formData, {
+                        headers: { 'Content-Type': 'multipart/form-data' }
+                    });
+                    audioJobsRef.current.add(res.data.id);
+                } catch (e) {
+                    console.error("Audio upload error", e);
+                    alert("Failed to upload recording. Please try again.");
+                }
             };
 
             recorder.start();
@@ -3,6 +3,7 @@ export interface Session {
     created_at: string;
     doctor_lang: string;
     patient_lang: string;
+    clinician_id?: string | null;
 }
 
 export interface Message {
@@ -13,6 +14,7 @@ export interface Message {
     translated_text?: string;
     audio_url?: string;
     timestamp: string;
+    stream_id?: string; // Set while the translation is still streaming in
 }
 
 export interface SummaryResponse {